@@ -4,34 +4,44 @@ from typing import Callable
 
 import numpy as np
 
+from optimizers import Optimizer, SgdOptimizer
 from utils import zip_utils as zp
+from utils.iter_utils import get_array_chunks
 
 
 class ActivationFunction:
 
     @staticmethod
-    def of_vec(xv: np.ndarray) -> np.ndarray:
+    def of_vec(xv: np.ndarray, out: np.ndarray = None) -> np.ndarray:
         pass
 
     @staticmethod
-    def der_of(x: np.ndarray) -> np.ndarray:
+    def der_of(x: np.ndarray, out: np.ndarray = None) -> np.ndarray:
         pass
 
 
 class SigmoidFunc(ActivationFunction):
 
+    # 1 / (1 + e^-x) == (1 + tanh(x / 2)) / 2, which does not overflow
     @staticmethod
     def _of(x: float) -> float:
-        return 1 / (1 + np.exp(-x))
+        return (1 + np.tanh(x / 2)) / 2
 
     @staticmethod
-    def of_vec(xv: np.ndarray) -> np.ndarray:
-        return 1 / (1 + np.exp(-xv))
-
+    def of_vec(xv: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        out = np.multiply(xv, 0.5, out=out)
+        np.tanh(out, out=out)
+        out += 1
+        out *= 0.5
+        return out
+
+    # s * (1 - s) == 0.25 - (s - 0.5) ** 2
     @staticmethod
-    def der_of(x: np.ndarray) -> np.ndarray:
-        s = SigmoidFunc._of(x)
-        return s * (1 - s)
+    def der_of(x: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        out = SigmoidFunc.of_vec(x, out=out)
+        out -= 0.5
+        np.square(out, out=out)
+        return np.subtract(0.25, out, out=out)
 
 
 class ReLuFunc(ActivationFunction):
@@ -41,12 +51,101 @@ class ReLuFunc(ActivationFunction):
         return max(0., x)
 
     @staticmethod
-    def of_vec(xv: np.ndarray) -> np.ndarray:
-        return (xv > 0).astype(float) * xv
+    def of_vec(xv: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        return np.maximum(xv, 0, out=out)
+
+    @staticmethod
+    def der_of(x: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        if out is None:
+            out = np.empty_like(x)
+        return np.greater(x, 0, out=out)
+
+
+# Normalizes each row (sample), so it can only be used in the output layer together with CrossEntropyCostFunc
+class SoftmaxFunc(ActivationFunction):
+
+    @staticmethod
+    def of_vec(xv: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        out = np.subtract(xv, np.max(xv, axis=-1, keepdims=True), out=out)
+        np.exp(out, out=out)
+        out /= np.sum(out, axis=-1, keepdims=True)
+        return out
+
+    @staticmethod
+    def der_of(x: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        raise ValueError('Softmax derivative is not element-wise. Use it with cross-entropy cost')
+
+
+def square_mean_costs(costs: list[np.ndarray] | np.ndarray) -> np.ndarray:
+    costs_array = np.asarray(costs)
+    squared_costs = np.square(costs_array)
+    return np.mean(np.sum(squared_costs, axis=1))
+
+
+class CostFunction:
+
+    # Per output costs
+    @staticmethod
+    def costs_of(a: np.ndarray, y: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        pass
+
+    @staticmethod
+    def cost_of(costs: np.ndarray) -> float:
+        pass
+
+    # Derivative of sample cost by output layer weighted sums
+    @staticmethod
+    def der_of(a: np.ndarray, y: np.ndarray, z: np.ndarray, f: ActivationFunction, out: np.ndarray = None
+               ) -> np.ndarray:
+        pass
+
+
+class SquareCostFunc(CostFunction):
+
+    @staticmethod
+    def costs_of(a: np.ndarray, y: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        out = np.subtract(y, a, out=out)
+        return np.square(out, out=out)
 
     @staticmethod
-    def der_of(x: np.ndarray) -> np.ndarray:
-        return (x > 0).astype(float)
+    def cost_of(costs: np.ndarray) -> float:
+        return square_mean_costs(costs)
+
+    # Overwrites z
+    @staticmethod
+    def der_of(a: np.ndarray, y: np.ndarray, z: np.ndarray, f: ActivationFunction, out: np.ndarray = None
+               ) -> np.ndarray:
+        out = np.subtract(a, y, out=out)
+        out *= 2
+        out *= f.der_of(z, out=z)
+        return out
+
+
+class CrossEntropyCostFunc(CostFunction):
+
+    @staticmethod
+    def costs_of(a: np.ndarray, y: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        out = np.maximum(a, np.finfo(a.dtype).tiny, out=out)
+        np.log(out, out=out)
+        out *= y
+        return np.negative(out, out=out)
+
+    @staticmethod
+    def cost_of(costs: np.ndarray) -> float:
+        return np.mean(np.sum(costs, axis=1))
+
+    # Softmax and cross-entropy derivatives combined
+    @staticmethod
+    def der_of(a: np.ndarray, y: np.ndarray, z: np.ndarray, f: ActivationFunction, out: np.ndarray = None
+               ) -> np.ndarray:
+        return np.subtract(a, y, out=out)
+
+
+def validate_functions(activation_functions: tuple[ActivationFunction, ...], cost_function: CostFunction):
+    if any(isinstance(f, SoftmaxFunc) for f in activation_functions[:-1]):
+        raise ValueError('Softmax can be used only in the output layer')
+    if isinstance(activation_functions[-1], SoftmaxFunc) != isinstance(cost_function, CrossEntropyCostFunc):
+        raise ValueError('Softmax output layer and cross-entropy cost must be used together')
 
 
 def validate_brain(weights: tuple[np.ndarray], biases: tuple[np.ndarray]):
@@ -55,6 +154,8 @@ def validate_brain(weights: tuple[np.ndarray], biases: tuple[np.ndarray]):
         raise ValueError('Weights and biases must have the same depth')
     if depth < 1:
         raise ValueError('Depth must be greater than 0')
+    if len({a.dtype for a in [*weights, *biases]}) != 1:
+        raise ValueError('Weights and biases must have the same dtype')
     for weight, bias in list(zip(weights, biases)):
         if len(weight.shape) != 2:
             raise ValueError(f'Weight must be two-dimensional (depth={depth})')
@@ -68,25 +169,120 @@ def validate_brain(weights: tuple[np.ndarray], biases: tuple[np.ndarray]):
             raise ValueError(f'Weight columns count must be equal to bias length (depth={depth})')
 
 
+def validate_input(x: np.ndarray):
+    if x.min(initial=0) < 0 or x.max(initial=0) > 1:
+        raise ValueError("All elements must have value in range: [0, 1]")
+
+
+# Places weights of all layers and then biases of all layers one after another in a single 1-D buffer,
+# so parameters and gradients can be updated, reduced, copied and shared as one array
+class ParamLayout:
+    def __init__(self, w_shapes: list[tuple[int, int]], b_shapes: list[tuple[int]]) -> None:
+        self.w_shapes = [tuple(s) for s in w_shapes]
+        self.b_shapes = [tuple(s) for s in b_shapes]
+        sizes = [int(np.prod(s)) for s in self.shapes]
+        self.offsets = [0, *np.cumsum(sizes).tolist()]
+        self.size = self.offsets[-1]
+
+    @property
+    def shapes(self) -> list[tuple[int, ...]]:
+        return self.w_shapes + self.b_shapes
+
+    def empty(self, dtype) -> np.ndarray:
+        return np.empty(self.size, dtype=dtype)
+
+    def pack(self, arrays: list[np.ndarray], dtype) -> np.ndarray:
+        flat = self.empty(dtype)
+        for view, array in zp.zip2(self._split(flat), arrays):
+            view[...] = array
+        return flat
+
+    # Per layer weight and bias views of a flat buffer
+    def views(self, flat: np.ndarray) -> tuple[tuple[np.ndarray, ...], tuple[np.ndarray, ...]]:
+        if flat.shape != (self.size,):
+            raise ValueError(f'Flat buffer must have shape {(self.size,)}. Got: {flat.shape}')
+        arrays = self._split(flat)
+        depth = len(self.w_shapes)
+        return tuple(arrays[:depth]), tuple(arrays[depth:])
+
+    def _split(self, flat: np.ndarray) -> list[np.ndarray]:
+        return [flat[left:right].reshape(shape)
+                for left, right, shape in zp.zip3(self.offsets[:-1], self.offsets[1:], self.shapes)]
+
+
+# Fields other than the scalars are None when the metric was reduced to a lower detail level.
+# Stats are (layer, stat) arrays of size, mean and sd
 @dataclass(frozen=True)
 class TrainMetric:
     data_used: int
-    w: tuple[np.ndarray, ...]
-    b: tuple[np.ndarray, ...]
-    w_gradient: tuple[np.ndarray, ...]
-    b_gradient: tuple[np.ndarray, ...]
     gradient_len: float
-    costs: tuple[np.ndarray, ...]
     cost: float
-    inputs: tuple[np.ndarray, ...]
-    outputs: tuple[np.ndarray, ...]
-    expected: tuple[np.ndarray, ...]
-
-
-def square_mean_costs(costs: list[np.ndarray]) -> np.ndarray:
-    costs_array = np.array(costs)
-    squared_costs = np.square(costs_array)
-    return np.mean(np.sum(squared_costs, axis=1))
+    layout: ParamLayout | None = None
+    params: np.ndarray | None = None
+    gradient: np.ndarray | None = None
+    w_stats: np.ndarray | None = None
+    b_stats: np.ndarray | None = None
+    w_gradient_stats: np.ndarray | None = None
+    b_gradient_stats: np.ndarray | None = None
+    costs: np.ndarray | None = None
+    inputs: list[np.ndarray] | np.ndarray | None = None
+    outputs: np.ndarray | None = None
+    expected: list[np.ndarray] | np.ndarray | None = None
+    # Train set indices of the samples, sent instead of inputs and expected
+    indices: np.ndarray | None = None
+
+    @property
+    def w(self) -> tuple[np.ndarray, ...] | None:
+        return self.layout.views(self.params)[0] if self.params is not None else None
+
+    @property
+    def b(self) -> tuple[np.ndarray, ...] | None:
+        return self.layout.views(self.params)[1] if self.params is not None else None
+
+    @property
+    def w_gradient(self) -> tuple[np.ndarray, ...] | None:
+        return self.layout.views(self.gradient)[0] if self.gradient is not None else None
+
+    @property
+    def b_gradient(self) -> tuple[np.ndarray, ...] | None:
+        return self.layout.views(self.gradient)[1] if self.gradient is not None else None
+
+
+def _fill(buffer: np.ndarray, vectors: list[np.ndarray] | np.ndarray):
+    if isinstance(vectors, np.ndarray):
+        np.copyto(buffer, vectors.reshape(buffer.shape), casting='same_kind')
+    else:
+        np.stack(vectors, out=buffer.reshape((len(vectors),) + np.shape(vectors[0])), casting='same_kind')
+
+
+# Buffers for one train step of a fixed network and batch size. Reused between steps, so anything
+# that must outlive a step has to be copied
+class TrainPlan:
+    def __init__(self, layout: ParamLayout, batch_size: int, dtype: np.dtype) -> None:
+        w_shapes = layout.w_shapes
+        n = batch_size
+        self.batch_size = batch_size
+        self.x = np.empty((n, w_shapes[0][1]), dtype=dtype)
+        self.y = np.empty((n, w_shapes[-1][0]), dtype=dtype)
+        self.z = [np.empty((n, rows), dtype=dtype) for rows, _ in w_shapes]
+        self.a = [self.x] + [np.empty((n, rows), dtype=dtype) for rows, _ in w_shapes]
+        self.dj_dz = [np.empty((n, rows), dtype=dtype) for rows, _ in w_shapes]
+        self.costs = np.empty((n, w_shapes[-1][0]), dtype=dtype)
+        self.gradient = layout.empty(dtype)
+        self.w_gradient, self.b_gradient = layout.views(self.gradient)
+        # Nonzero input columns and x restricted to them, when the first layer takes the sparse path
+        self.x_columns: np.ndarray | None = None
+        self.x_sparse: np.ndarray | None = None
+
+    def load(self, x_vectors: list[np.ndarray] | np.ndarray, y_vectors: list[np.ndarray] | np.ndarray):
+        _fill(self.x, x_vectors)
+        _fill(self.y, y_vectors)
+
+
+# Highest share of nonzero input columns in a batch for which the first layer skips the zero columns.
+# Above it gathering the columns costs more than the dense product saves. Chunks of MNIST digits have most
+# columns nonzero, so they stay dense
+sparse_input_max_density = 0.3
 
 
 def default_learning_rate(gradient_length, **_):
@@ -98,56 +294,129 @@ class Ai:
                  weights: tuple[np.ndarray, ...],
                  biases: tuple[np.ndarray, ...],
                  activation_functions: tuple[ActivationFunction, ...] = None,
-                 learning_rate: Number | Callable = None
+                 learning_rate: Number | Callable = None,
+                 optimizer: Optimizer = None,
+                 cost_function: CostFunction = None,
+                 sparse_input: bool | None = False
                  ) -> None:
         if activation_functions is None:
             activation_functions = [SigmoidFunc() for _ in biases]
+        if cost_function is None:
+            cost_function = SquareCostFunc()
         if learning_rate is None:
             learning_rate = default_learning_rate
+        if optimizer is None:
+            optimizer = SgdOptimizer()
 
         validate_brain(weights, biases)
-        self.w: tuple[np.ndarray] = weights
-        self.b: tuple[np.ndarray] = biases
+        validate_functions(tuple(activation_functions), cost_function)
+        self.layout = ParamLayout([w.shape for w in weights], [b.shape for b in biases])
+        self.dtype: np.dtype = weights[0].dtype
+        self.params: np.ndarray = self.layout.pack([*weights, *biases], self.dtype)
+        self.w: tuple[np.ndarray, ...]
+        self.b: tuple[np.ndarray, ...]
+        self.w, self.b = self.layout.views(self.params)
         self.f: tuple[ActivationFunction] = activation_functions
+        self.cost_function = cost_function
         self.learning_rate = learning_rate
+        self.optimizer = optimizer
+        # True, False, or None to detect sparse batches by sparse_input_max_density
+        self.sparse_input = sparse_input
         self.data_used = 0
+        self._plan: TrainPlan | None = None
+
+    # Views and plan buffers are rebuilt on unpickling, so they keep sharing memory with params
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['w'], state['b']
+        state['_plan'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.w, self.b = self.layout.views(self.params)
+
+    # Makes the model use the given flat buffer (e.g. in shared memory) as its parameters, without copying
+    def bind_params(self, params: np.ndarray):
+        if params.dtype != self.dtype:
+            raise ValueError(f'Parameters must have dtype {self.dtype}. Got: {params.dtype}')
+        self.w, self.b = self.layout.views(params)
+        self.params = params
 
     def feed(self, x: np.ndarray) -> np.ndarray:
-        return self._feed(x)[1][-1]
-
+        return self._feed(x.reshape(1, -1))[1][-1][0]
+
+    # x.shape=(n, 28, 28) or (n, 784)
+    def feed_batch(self, x: np.ndarray, validate=True, chunk_size=1024) -> np.ndarray:
+        x = x.reshape(x.shape[0], -1)
+        if validate:
+            validate_input(x)
+        outputs = np.empty((x.shape[0], self.b[-1].size), dtype=self.dtype)
+        for x_chunk, out_chunk in zp.zip2(get_array_chunks(x, chunk_size), get_array_chunks(outputs, chunk_size)):
+            out_chunk[...] = self._feed(x_chunk, validate=False)[1][-1]
+        return outputs
+
+    # Returns output activations and guessed labels
+    def predict(self, x: np.ndarray, validate=True, chunk_size=1024) -> tuple[np.ndarray, np.ndarray]:
+        outputs = self.feed_batch(x, validate=validate, chunk_size=chunk_size)
+        return outputs, outputs.argmax(axis=1)
+
+    # With snapshot=False the metric holds live parameters and plan buffers, valid until the next step
     def train(self,
-              x_vectors: list[np.ndarray],
-              y_vectors: list[np.ndarray]
+              x_vectors: list[np.ndarray] | np.ndarray,
+              y_vectors: list[np.ndarray] | np.ndarray,
+              snapshot=False
               ) -> TrainMetric:
-        w_gradient_sum = [np.zeros(w.shape) for w in self.w]
-        b_gradient_sum = [np.zeros(b.shape) for b in self.b]
-        costs = []
-        outputs = []
-        for x_vec, y_vec in zp.zip2(x_vectors, y_vectors):
-            z_state, a_state = self._feed(x_vec)
-            w_local_gradient, b_local_gradient = self._backpropagate(z_state, a_state, y_vec)
-            w_gradient_sum = [ws + w for ws, w in zp.zip2(w_gradient_sum, w_local_gradient)]
-            b_gradient_sum = [bs + b for bs, b in zp.zip2(b_gradient_sum, b_local_gradient)]
-            costs.append(np.array([(y - a) ** 2 for y, a in zp.zip2(y_vec, a_state[-1])]))
-            outputs.append(a_state[-1])
-        n = len(x_vectors)
-        w_gradient = [w / n for w in w_gradient_sum]
-        b_gradient = [b / n for b in b_gradient_sum]
-        cost = square_mean_costs(costs)
-        gradient_len = np.sqrt(sum([np.sum(gc ** 2) for gc in w_gradient + b_gradient]))
+        plan = self.compute_gradient(x_vectors, y_vectors)
+        return self.apply_gradient(plan.gradient, plan.costs, plan.a[-1], x_vectors, y_vectors, snapshot=snapshot)
+
+    # Gradient is averaged over batch_size samples, so gradients of batch parts add up to the whole batch gradient
+    def compute_gradient(self,
+                         x_vectors: list[np.ndarray] | np.ndarray,
+                         y_vectors: list[np.ndarray] | np.ndarray,
+                         batch_size: int = None
+                         ) -> TrainPlan:
+        plan = self._get_plan(len(x_vectors))
+        plan.load(x_vectors, y_vectors)
+        validate_input(plan.x)
+        self._feed_plan(plan)
+        self._backpropagate(plan, batch_size if batch_size is not None else plan.batch_size)
+        self.cost_function.costs_of(plan.a[-1], plan.y, out=plan.costs)
+        return plan
+
+    def apply_gradient(self,
+                       gradient: np.ndarray,
+                       costs: np.ndarray,
+                       outputs: np.ndarray,
+                       x_vectors: list[np.ndarray] | np.ndarray,
+                       y_vectors: list[np.ndarray] | np.ndarray,
+                       snapshot=False
+                       ) -> TrainMetric:
+        cost = self.cost_function.cost_of(costs)
+        gradient_len = np.sqrt(np.vdot(gradient, gradient))
+
+        copy = np.copy if snapshot else lambda a: a
+        gradient_metric = copy(gradient)
+        costs, outputs = copy(costs), copy(outputs)
+
         if gradient_len != 0:
             learning_rate = self._get_learning_rate(cost, gradient_len)
-            self._patch(w_gradient, b_gradient, learning_rate)
+            self._patch(gradient, learning_rate)
         self.data_used += len(x_vectors)
         return TrainMetric(
-            data_used=self.data_used, w=self.w, b=self.b, w_gradient=tuple(w_gradient), b_gradient=tuple(b_gradient),
-            gradient_len=gradient_len, costs=tuple(costs), cost=cost, inputs=tuple(x_vectors),
-            outputs=tuple(outputs), expected=tuple(y_vectors)
+            data_used=self.data_used, layout=self.layout, params=copy(self.params), gradient=gradient_metric,
+            gradient_len=gradient_len, costs=costs, cost=cost, inputs=x_vectors, outputs=outputs,
+            expected=y_vectors
         )
 
-    def _patch(self, w_gradient: list[np.ndarray], b_gradient: list[np.ndarray], learning_rate):
-        self.w = [w - wd * learning_rate for w, wd in zp.zip2(self.w, w_gradient)]
-        self.b = [b - bd * learning_rate for b, bd in zp.zip2(self.b, b_gradient)]
+    def _get_plan(self, batch_size: int) -> TrainPlan:
+        if self._plan is None or self._plan.batch_size != batch_size:
+            self._plan = TrainPlan(self.layout, batch_size, self.dtype)
+        return self._plan
+
+    def _patch(self, gradient: np.ndarray, learning_rate):
+        learning_rate = self.dtype.type(learning_rate)
+        self.optimizer.step([self.params], [gradient], learning_rate)
 
     def _get_learning_rate(self, cost, gradient_length):
         if isinstance(self.learning_rate, Number):
@@ -156,28 +425,56 @@ class Ai:
             return self.learning_rate(cost=cost, gradient_length=gradient_length)
         raise ValueError('Learn rate must be Number or Callable')
 
-    def _feed(self, x: np.ndarray) -> tuple[list[np.ndarray], list[np.ndarray]]:
-        if x.ndim > 1:
-            x = x.flatten()
-        if not all(0 <= xi <= 1 for xi in x):
-            raise ValueError("All elements must have value in range: [0, 1]")
+    # x.shape=(n, input); z and a are lists of (n, layer) matrices, one row per sample
+    def _feed(self, x: np.ndarray, validate=True) -> tuple[list[np.ndarray], list[np.ndarray]]:
+        if validate:
+            validate_input(x)
+        x = x.astype(self.dtype, copy=False)
         z_factors = []
         activations = [x]
         for w, b, f in zp.zip3(self.w, self.b, self.f):
-            z = np.dot(w, x) + b
+            z = x @ w.T + b
             x = f.of_vec(z)
             z_factors.append(z)
             activations.append(x)
         return z_factors, activations
 
-    def _backpropagate(self, z: list[np.ndarray], a: list[np.ndarray], y: np.ndarray):
-        dj_dw_list, dj_db_list = [], []
-        dj_da = (a[-1] - y) * 2
-        for w_l, f, z_l, a_pl in zp.zip4(self.w[::-1], self.f[::-1], z[::-1], a[-2::-1]):
-            dj_db = dj_dz = f.der_of(z_l) * dj_da
-            dj_dw = np.expand_dims(dj_dz, 1) @ np.expand_dims(a_pl, 0)
-            dj_da = w_l.T @ dj_dz
-            dj_dw_list.insert(0, dj_dw)
-            dj_db_list.insert(0, dj_db)
-
-        return dj_dw_list, dj_db_list
+    def _get_input_columns(self, x: np.ndarray) -> np.ndarray | None:
+        if self.sparse_input is False:
+            return None
+        columns = np.flatnonzero(np.any(x, axis=0))
+        if self.sparse_input is None and columns.size > x.shape[1] * sparse_input_max_density:
+            return None
+        return columns
+
+    def _feed_plan(self, plan: TrainPlan):
+        plan.x_columns = self._get_input_columns(plan.x)
+        plan.x_sparse = plan.x[:, plan.x_columns] if plan.x_columns is not None else None
+        for layer, (w, b, f) in enumerate(zp.zip3(self.w, self.b, self.f)):
+            z = plan.z[layer]
+            if layer == 0 and plan.x_sparse is not None:
+                np.matmul(plan.x_sparse, w[:, plan.x_columns].T, out=z)
+            else:
+                np.matmul(plan.a[layer], w.T, out=z)
+            z += b
+            f.of_vec(z, out=plan.a[layer + 1])
+
+    # Fills plan gradients averaged over batch_size samples. Overwrites plan.z with activation derivatives
+    def _backpropagate(self, plan: TrainPlan, batch_size: int):
+        output_layer = len(self.w) - 1
+        dj_dz = plan.dj_dz[output_layer]
+        self.cost_function.der_of(plan.a[-1], plan.y, plan.z[output_layer], self.f[output_layer], out=dj_dz)
+        dj_dz *= 1 / batch_size
+        for layer in reversed(range(len(self.w))):
+            dj_dz = plan.dj_dz[layer]
+            if layer != output_layer:
+                dj_dz *= self.f[layer].der_of(plan.z[layer], out=plan.z[layer])
+            np.sum(dj_dz, axis=0, out=plan.b_gradient[layer])
+            if layer == 0 and plan.x_sparse is not None:
+                plan.w_gradient[layer].fill(0)
+                plan.w_gradient[layer][:, plan.x_columns] = dj_dz.T @ plan.x_sparse
+            else:
+                np.matmul(dj_dz.T, plan.a[layer], out=plan.w_gradient[layer])
+            if layer > 0:
+                # dj_da of the previous layer
+                np.matmul(dj_dz, self.w[layer], out=plan.dj_dz[layer - 1])
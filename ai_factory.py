@@ -0,0 +1,103 @@
+import numpy as np
+
+import ai
+import optimizers
+from resources import app_ini
+from resources.app_ini import AiCfg, Distribution, DistributionType, DistributionParam, Optimizer, OptimizerType, \
+    OptimizerParam
+from utils.zip_utils import zip2, zip3
+
+activation_funcs = {
+    app_ini.ActivationFunction.SIGMOID: ai.SigmoidFunc(),
+    app_ini.ActivationFunction.RELU: ai.ReLuFunc(),
+    app_ini.ActivationFunction.SOFTMAX: ai.SoftmaxFunc()
+}
+
+cost_funcs = {
+    app_ini.CostFunction.SQUARE: ai.SquareCostFunc(),
+    app_ini.CostFunction.CROSS_ENTROPY: ai.CrossEntropyCostFunc()
+}
+
+sparse_inputs = {
+    app_ini.SparseInput.AUTO: None,
+    app_ini.SparseInput.ON: True,
+    app_ini.SparseInput.OFF: False
+}
+
+
+# Using Callable class because it's impossible to pickle local objects (decorator funcs)
+class LearningRate:
+    def __init__(self, learning_rate_map) -> None:
+        super().__init__()
+        self.learning_rate_map = learning_rate_map
+
+    def __call__(self, cost, gradient_length, **_):
+        if gradient_length == 0:
+            return 0
+        key = max([c for c in self.learning_rate_map.keys() if c <= cost])
+        val = self.learning_rate_map[key]
+        if val <= 0:
+            return 1 / gradient_length
+        else:
+            return val
+
+
+def create_optimizer(optimizer: Optimizer) -> optimizers.Optimizer:
+    o_type = optimizer.type
+    if o_type == OptimizerType.SGD:
+        return optimizers.SgdOptimizer()
+    elif o_type == OptimizerType.MOMENTUM:
+        return optimizers.MomentumOptimizer(momentum=optimizer.params[OptimizerParam.MOMENTUM.value])
+    elif o_type == OptimizerType.NESTEROV:
+        return optimizers.NesterovOptimizer(momentum=optimizer.params[OptimizerParam.MOMENTUM.value])
+    elif o_type == OptimizerType.RMSPROP:
+        return optimizers.RmsPropOptimizer(decay=optimizer.params[OptimizerParam.DECAY.value])
+    elif o_type == OptimizerType.ADAM:
+        beta1 = optimizer.params[OptimizerParam.BETA1.value]
+        beta2 = optimizer.params[OptimizerParam.BETA2.value]
+        return optimizers.AdamOptimizer(beta1=beta1, beta2=beta2)
+    raise ValueError(f'Invalid optimizer: {optimizer}')
+
+
+def generate_numbers(shape: int | tuple[int, ...], distribution: Distribution, dtype=np.float64):
+    d_type = distribution.type
+    if d_type == DistributionType.UNIFORM:
+        a = distribution.params[DistributionParam.LB.value]
+        b = distribution.params[DistributionParam.RB.value]
+        return np.random.uniform(low=a, high=b, size=shape).astype(dtype)
+    elif d_type == DistributionType.GAUSSIAN:
+        m = distribution.params[DistributionParam.MEAN.value]
+        sd = distribution.params[DistributionParam.SD.value]
+        return np.random.normal(loc=m, scale=sd, size=shape).astype(dtype)
+    raise ValueError(f'Invalid distribution: {distribution}')
+
+
+def generate_weights_and_biases(cfg: AiCfg):
+    layers = cfg.layers
+    w_distributions = cfg.weight_distributions
+    b_distributions = cfg.bias_distributions
+    dtype = np.dtype(cfg.dtype.value)
+    if len(layers) < 2:
+        raise ValueError('Expected 2 or more layers')
+
+    weights = []
+    for layer_size, prev_layer_size, w_distr in zip3(layers[1:], layers[:-1], w_distributions):
+        w = generate_numbers(shape=(layer_size, prev_layer_size), distribution=w_distr, dtype=dtype)
+        weights.append(w)
+
+    biases = []
+    for layer_size, b_distr in zip2(layers[1:], b_distributions):
+        b = generate_numbers(shape=layer_size, distribution=b_distr, dtype=dtype)
+        biases.append(b)
+
+    return tuple(weights), tuple(biases)
+
+
+def create_ai(cfg: AiCfg) -> ai.Ai:
+    learning_rate = LearningRate(cfg.learning_rate)
+    activation_functions = tuple([activation_funcs[f] for f in cfg.activation_functions])
+    cost_function = cost_funcs[cfg.cost_function]
+    optimizer = create_optimizer(cfg.optimizer)
+    w, b = generate_weights_and_biases(cfg)
+    return ai.Ai(w, b, activation_functions=activation_functions, learning_rate=learning_rate,
+                 optimizer=optimizer, cost_function=cost_function, sparse_input=sparse_inputs[cfg.sparse_input])
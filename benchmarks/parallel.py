@@ -0,0 +1,75 @@
+from timeit import default_timer as timer
+
+import numpy as np
+
+import ai
+from ai_factory import create_ai
+from data_set import train_x, train_y, test_x, raw_test_y
+from metrics import MetricReducer
+from resources import app_ini
+from resources.app_ini import ParallelMode, MetricDetail
+from training import train
+from utils.iter_utils import EpochSampler
+
+WORKERS = 4
+CHUNK_COUNT = 3000
+SNAPSHOT_INTERVAL = 100
+TARGET_ACCURACY = 0.9
+MODES = (
+    ('Serial', 1, ParallelMode.SYNC),
+    ('Sync', WORKERS, ParallelMode.SYNC),
+    ('Hogwild', WORKERS, ParallelMode.HOGWILD),
+)
+
+
+# Queue replacement that keeps a timed parameter snapshot of every metric sent with parameters
+class SnapshotCollector:
+    def __init__(self) -> None:
+        self._begin = timer()
+        self.elapsed = None
+        self.data_used = 0
+        self.snapshots = []
+
+    def put(self, metric: ai.TrainMetric | None):
+        if metric is None:
+            self.elapsed = timer() - self._begin
+            return
+        self.data_used = metric.data_used
+        if metric.params is not None:
+            self.snapshots.append((timer() - self._begin, metric.w, metric.b))
+
+
+def time_to_accuracy(snapshots, activation_functions, cost_function: ai.CostFunction,
+                     target: float) -> tuple[float | None, float]:
+    x, labels = np.asarray(test_x), raw_test_y
+    accuracy = 0
+    for elapsed, w, b in snapshots:
+        ai_model = ai.Ai(w, b, activation_functions=activation_functions, cost_function=cost_function)
+        _, guesses = ai_model.predict(x, validate=False)
+        accuracy = np.mean(guesses == labels)
+        if accuracy >= target:
+            return elapsed, accuracy
+    return None, accuracy
+
+
+def run_benchmark():
+    cfg = app_ini.cfg
+    print(f'Chunk size: {cfg.train.chunk_size}, chunk count: {CHUNK_COUNT}, workers: {WORKERS}')
+    print(f'{"mode":>8} {"samples/s":>10} {f"time to {TARGET_ACCURACY:.0%}":>12} {"last accuracy":>14}')
+    for name, workers, mode in MODES:
+        np.random.seed(0)
+        ai_model = create_ai(cfg.ai)
+        sampler = EpochSampler(len(train_x), cfg.train.chunk_size, CHUNK_COUNT, seed=0)
+        collector = SnapshotCollector()
+        train(collector, (train_x, train_y), sampler, ai_model, workers, mode,
+              MetricReducer(MetricDetail.SCALARS, SNAPSHOT_INTERVAL))
+
+        rate = collector.data_used / collector.elapsed
+        elapsed, accuracy = time_to_accuracy(collector.snapshots, ai_model.f, ai_model.cost_function,
+                                             TARGET_ACCURACY)
+        elapsed_text = f'{elapsed:.2f}s' if elapsed is not None else '-'
+        print(f'{name:>8} {rate:>10.0f} {elapsed_text:>12} {accuracy:>14.3f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,63 @@
+import pickle
+from timeit import default_timer as timer
+
+import numpy as np
+
+import ai
+from resources import app_ini
+from utils.zip_utils import zip2
+
+DTYPES = (np.float64, np.float32)
+TRAIN_STEPS = 500
+TEST_SIZE = 10000
+
+
+def create_ai(layers: tuple[int, ...], dtype) -> ai.Ai:
+    rng = np.random.default_rng(0)
+    weights = tuple(rng.normal(0.01, 0.05, size=(r, l)).astype(dtype) for l, r in zip2(layers[:-1], layers[1:]))
+    biases = tuple(np.zeros(r, dtype=dtype) for r in layers[1:])
+    activation_functions = tuple([ai.ReLuFunc() for _ in biases[:-1]] + [ai.SigmoidFunc()])
+    return ai.Ai(weights, biases, activation_functions=activation_functions)
+
+
+def create_data(size: int, layers: tuple[int, ...], dtype):
+    rng = np.random.default_rng(1)
+    x = rng.random((size, layers[0]), dtype=np.float64)
+    x[x < 0.8] = 0
+    y = np.eye(layers[-1])[rng.integers(0, layers[-1], size)]
+    return x.astype(dtype), y.astype(dtype)
+
+
+def benchmark(dtype, layers: tuple[int, ...], chunk_size: int):
+    ai_model = create_ai(layers, dtype)
+    x, y = create_data(chunk_size * TRAIN_STEPS, layers, dtype)
+    test_x, _ = create_data(TEST_SIZE, layers, dtype)
+
+    metric = None
+    begin = timer()
+    for pos in range(0, x.shape[0], chunk_size):
+        metric = ai_model.train(x[pos:pos + chunk_size], y[pos:pos + chunk_size])
+    train_rate = x.shape[0] / (timer() - begin)
+
+    begin = timer()
+    ai_model.predict(test_x)
+    predict_rate = TEST_SIZE / (timer() - begin)
+
+    params_size = ai_model.params.nbytes
+    metric_size = len(pickle.dumps(metric))
+    return train_rate, predict_rate, params_size, metric_size
+
+
+def run_benchmark():
+    layers = app_ini.cfg.ai.layers
+    chunk_size = app_ini.cfg.train.chunk_size
+    print(f'Layers: {layers}, chunk size: {chunk_size}, train steps: {TRAIN_STEPS}')
+    print(f'{"dtype":>8} {"train/s":>10} {"predict/s":>10} {"params KB":>10} {"metric KB":>10}')
+    for dtype in DTYPES:
+        train_rate, predict_rate, params_size, metric_size = benchmark(dtype, layers, chunk_size)
+        print(f'{np.dtype(dtype).name:>8} {train_rate:>10.0f} {predict_rate:>10.0f} '
+              f'{params_size / 1024:>10.1f} {metric_size / 1024:>10.1f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,80 @@
+import copy
+import multiprocessing as mp
+from timeit import default_timer as timer
+
+import numpy as np
+
+from ai_factory import create_ai
+from buffered_queue import BufferedQueue
+from metrics import MetricReducer
+from resources import app_ini
+from resources.app_ini import MetricDetail, MetricTransport
+from shared_queue import SharedMetricQueue
+
+METRIC_COUNT = 2000
+METRIC_POOL_SIZE = 16
+DETAILS = (MetricDetail.SUMMARY, MetricDetail.FULL)
+
+
+def create_metrics(detail: MetricDetail, count: int):
+    cfg = app_ini.cfg
+    np.random.seed(0)
+    ai_model = create_ai(cfg.ai)
+    rng = np.random.default_rng(0)
+    x = rng.random((cfg.train.chunk_size, cfg.ai.layers[0]))
+    y = np.eye(cfg.ai.layers[-1])[rng.integers(0, cfg.ai.layers[-1], cfg.train.chunk_size)]
+    reducer = MetricReducer(detail)
+    # Only the transport is measured, so a few distinct copies of one step are repeated. Copies, as pickle
+    # would send repeated objects of a batch only once
+    metric = reducer.reduce(ai_model.train(x, y))
+    pool = [copy.deepcopy(metric) for _ in range(METRIC_POOL_SIZE)]
+    return ai_model, [pool[i % METRIC_POOL_SIZE] for i in range(count)]
+
+
+def metric_size(metric) -> int:
+    return sum(a.nbytes for a in vars(metric).values() if isinstance(a, np.ndarray))
+
+
+def produce(metrics_queue, metrics):
+    for metric in metrics:
+        metrics_queue.put(metric)
+    metrics_queue.put(None)
+
+
+def create_queue(transport: MetricTransport, ai_model):
+    processing = app_ini.cfg.processing
+    if transport is MetricTransport.SHARED_MEMORY:
+        return SharedMetricQueue(ai_model.layout, app_ini.cfg.train.chunk_size, ai_model.dtype,
+                                 capacity=processing.queue_max_size * processing.queue_batch_size,
+                                 batch_size=processing.queue_batch_size)
+    return BufferedQueue(max_size=processing.queue_max_size, batch_size=processing.queue_batch_size)
+
+
+def benchmark(transport: MetricTransport, detail: MetricDetail) -> tuple[float, float]:
+    ai_model, metrics = create_metrics(detail, METRIC_COUNT)
+    metrics_queue = create_queue(transport, ai_model)
+    process = mp.Process(target=produce, args=(metrics_queue, metrics))
+
+    received = 0
+    begin = timer()
+    process.start()
+    while (batch := metrics_queue.get()) is not None:
+        # Touch what a hub would read
+        received += sum(metric_size(m) for m in batch)
+    elapsed = timer() - begin
+    process.join()
+    metrics_queue.close()
+    return len(metrics) / elapsed, received / elapsed / 2 ** 20
+
+
+def run_benchmark():
+    print(f'Layers: {app_ini.cfg.ai.layers}, chunk size: {app_ini.cfg.train.chunk_size}, metrics: {METRIC_COUNT}')
+    print(f'{"transport":>13} {"detail":>8} {"metrics/s":>10} {"MB/s":>8}')
+    for detail in DETAILS:
+        for transport in MetricTransport:
+            rate, throughput = benchmark(transport, detail)
+            print(f'{transport.value:>13} {detail.value:>8} {rate:>10.0f} {throughput:>8.1f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -1,25 +1,149 @@
 import multiprocessing as mp
+import queue
+import threading
+from timeit import default_timer as timer
 
+from metrics import strip_snapshot
+from resources.app_ini import BackpressurePolicy
 
-class BufferedQueue:
-    def __init__(self, max_size, batch_size, send_incomplete=True) -> None:
-        super().__init__()
-        self._queue = mp.Queue(maxsize=max_size)
+# Pending metrics COALESCE keeps at most. Past it the stride of the kept metrics doubles, so the backlog keeps
+# spanning all unsent steps evenly at half the resolution
+COALESCE_MAX_PENDING = 1024
+
+
+# Collects put objects into batches on the producer side. A batch is sent when it has batch_size objects or,
+# with a flush interval, by a background thread once its first object waited that many seconds, also while the
+# producer is busy. A producer going idle may call flush to send what is pending. When the receiver falls behind:
+# BLOCK waits for it, DROP_OLDEST keeps only the newest batch_size pending objects,
+# COALESCE keeps the scalars of up to COALESCE_MAX_PENDING pending metrics but the arrays of the newest one only
+class MetricBuffer:
+    def __init__(self, batch_size, send_incomplete=True, policy=BackpressurePolicy.BLOCK, flush_interval=0.) -> None:
         self._batch = []
+        # Numbers of the pending objects in the order they were put
+        self._seqs = []
+        self._put_count = 0
+        # COALESCE keeps older pending metrics whose number is a multiple of it
+        self._stride = 1
         self._batch_size = batch_size
         self._send_incomplete = send_incomplete
+        self._policy = policy
+        self._flush_interval = flush_interval
+        self._batch_begin = None
+        self._init_flusher()
+
+    # The lock and the thread belong to the producer process, so they are created anew when unpickled
+    def _init_flusher(self):
+        self._lock = threading.Condition()
+        self._flusher: threading.Thread | None = None
+        self._finished = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock'], state['_flusher'], state['_finished']
+        return state
 
-    def put_nowait(self, o):
-        if o is None:
-            if self._send_incomplete and len(self._batch) > 0:
-                self._queue.put_nowait(tuple(self._batch))
-            self._queue.put_nowait(None)
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_flusher()
+
+    def put(self, o):
+        with self._lock:
+            if o is None:
+                if self._send_incomplete and len(self._batch) > 0:
+                    self._send(tuple(self._batch), block=True)
+                self._send(None, block=True)
+                self._batch.clear()
+                self._seqs.clear()
+                self._finished = True
+                self._lock.notify()
+                return
+
+            if not self._batch:
+                self._batch_begin = timer()
+                self._wake_flusher()
+            self._batch.append(o)
+            self._seqs.append(self._put_count)
+            self._put_count += 1
+            if len(self._batch) >= self._batch_size:
+                self._send_batch()
+
+    # Sends the pending incomplete batch, if incomplete batches are sent
+    def flush(self):
+        with self._lock:
+            if self._send_incomplete and self._batch:
+                self._send_batch()
+
+    def _wake_flusher(self):
+        if self._flush_interval <= 0 or not self._send_incomplete:
             return
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_when_due, daemon=True)
+            self._flusher.start()
+        self._lock.notify()
+
+    def _flush_when_due(self):
+        with self._lock:
+            while not self._finished:
+                if not self._batch:
+                    self._lock.wait()
+                    continue
+                remaining = self._batch_begin + self._flush_interval - timer()
+                if remaining > 0:
+                    self._lock.wait(remaining)
+                else:
+                    self._send_batch()
+                    # What is left after a partial send waits another interval
+                    self._batch_begin = timer()
 
-        self._batch.append(o)
-        if len(self._batch) >= self._batch_size:
-            self._queue.put_nowait(tuple(self._batch))
-            self._batch.clear()
+    def _send_batch(self):
+        sent = self._send(tuple(self._batch), block=self._policy is BackpressurePolicy.BLOCK)
+        del self._batch[:sent], self._seqs[:sent]
+        if self._batch:
+            self._shed()
+        else:
+            self._stride = 1
+
+    def _shed(self):
+        if self._policy is BackpressurePolicy.DROP_OLDEST:
+            del self._batch[:-self._batch_size], self._seqs[:-self._batch_size]
+        elif self._policy is BackpressurePolicy.COALESCE:
+            self._coalesce()
+
+    # Strips the metric before the newest, or drops it if it is off the stride; older ones were handled by
+    # earlier calls. The newest is always kept
+    def _coalesce(self):
+        if len(self._batch) < 2:
+            return
+        if self._seqs[-2] % self._stride:
+            del self._batch[-2], self._seqs[-2]
+        else:
+            self._batch[-2] = strip_snapshot(self._batch[-2])
+        if len(self._batch) > COALESCE_MAX_PENDING:
+            self._stride *= 2
+            kept = [i for i, seq in enumerate(self._seqs[:-1]) if seq % self._stride == 0] + [len(self._seqs) - 1]
+            self._batch = [self._batch[i] for i in kept]
+            self._seqs = [self._seqs[i] for i in kept]
+
+    # Returns the number of objects sent, which is less than the batch size only when block is False
+    def _send(self, batch: tuple | None, block: bool) -> int:
+        pass
+
+
+class BufferedQueue(MetricBuffer):
+    def __init__(self, max_size, batch_size, send_incomplete=True, policy=BackpressurePolicy.BLOCK,
+                 flush_interval=0.) -> None:
+        super().__init__(batch_size, send_incomplete, policy, flush_interval)
+        self._queue = mp.Queue(maxsize=max_size)
+
+    def _send(self, batch, block):
+        try:
+            self._queue.put(batch, block)
+            return len(batch) if batch is not None else 1
+        except queue.Full:
+            return 0
 
     def get(self, block=True, timeout=None) -> tuple:
         return self._queue.get(block, timeout)
+
+    def close(self):
+        self._queue.close()
@@ -0,0 +1,109 @@
+import copy
+import multiprocessing as mp
+from enum import Enum
+
+import ai
+from ai_factory import LearningRate
+from metrics import MetricReducer
+from resources.app_ini import MetricDetail
+
+
+class TrainCommand(Enum):
+    PAUSE = 'Pause'
+    RESUME = 'Resume'
+    STOP = 'Stop'
+    SET_LEARNING_RATE = 'SetLearningRate'
+    SET_METRIC_DETAIL = 'SetMetricDetail'
+
+
+class TrainState(Enum):
+    RUNNING = 'Running'
+    PAUSED = 'Paused'
+    STOPPED = 'Stopped'
+
+
+_STATES = list(TrainState)
+
+
+# Commands from the UI or CLI to a training run, and the state of the run back. Every polling process gets its
+# own copy of every command through its own queue. Between chunks it only compares the shared count of sent
+# commands with the count it took, so a poll is a shared memory read while nothing is sent.
+# Commands are sent from a single thread
+class TrainControl:
+    def __init__(self, consumers=1) -> None:
+        if consumers < 1:
+            raise ValueError(f'Consumers count must be positive. Got: {consumers}')
+        self._queues = [mp.Queue() for _ in range(consumers)]
+        self._sent = mp.RawValue('q', 0)
+        self._state = mp.RawValue('i', _STATES.index(TrainState.RUNNING))
+        self._rank = 0
+        self._taken = 0
+
+    @property
+    def consumers(self) -> int:
+        return len(self._queues)
+
+    # Control for the polling process number rank; the state is reported by rank 0 only
+    def consumer(self, rank: int) -> 'TrainControl':
+        if not 0 <= rank < self.consumers:
+            raise ValueError(f'Rank must be in [0, {self.consumers}). Got: {rank}')
+        control = copy.copy(self)
+        control._rank = rank
+        control._taken = 0
+        return control
+
+    @property
+    def state(self) -> TrainState:
+        return _STATES[self._state.value]
+
+    def pause(self):
+        self._send(TrainCommand.PAUSE)
+
+    def resume(self):
+        self._send(TrainCommand.RESUME)
+
+    def stop(self):
+        self._send(TrainCommand.STOP)
+
+    # Same map as the learning rate of the AI config: cost thresholds to rates. A threshold must be at most 0,
+    # as a cost below the lowest one has no rate
+    def set_learning_rate(self, learning_rate_map: dict[float, float]):
+        if not learning_rate_map or min(learning_rate_map) > 0:
+            raise ValueError(f'The lowest cost threshold must not exceed 0. Got: {learning_rate_map}')
+        self._send(TrainCommand.SET_LEARNING_RATE, dict(learning_rate_map))
+
+    def set_metric_detail(self, detail: MetricDetail):
+        self._send(TrainCommand.SET_METRIC_DETAIL, detail)
+
+    def _send(self, command: TrainCommand, value=None):
+        for q in self._queues:
+            q.put((command, value))
+        self._sent.value += 1
+
+    # Applies the commands sent since the last poll, waiting for resume while paused. The metric queue, if any,
+    # is flushed before waiting, so the pending metrics are shown meanwhile. Returns False when the training
+    # has to stop
+    def poll(self, ai_model: ai.Ai, reducer: MetricReducer = None, queue=None) -> bool:
+        paused = False
+        while self._sent.value > self._taken or paused:
+            if paused and queue is not None and self._sent.value == self._taken:
+                queue.flush()
+            command, value = self._queues[self._rank].get()
+            self._taken += 1
+            if command is TrainCommand.PAUSE:
+                paused = True
+            elif command is TrainCommand.RESUME:
+                paused = False
+            elif command is TrainCommand.STOP:
+                self._set_state(TrainState.STOPPED)
+                return False
+            elif command is TrainCommand.SET_LEARNING_RATE:
+                ai_model.learning_rate = LearningRate(value)
+            elif command is TrainCommand.SET_METRIC_DETAIL and reducer is not None:
+                reducer.detail = value
+            self._set_state(TrainState.PAUSED if paused else TrainState.RUNNING)
+        return True
+
+    def _set_state(self, state: TrainState):
+        if self._rank == 0:
+            self._state.value = _STATES.index(state)
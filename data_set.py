@@ -1,10 +1,39 @@
+import argparse
+import gzip
+import os
+import struct
+import urllib.request
+from typing import Callable
+
 import numpy as np
-import tensorflow as tf
+
+from resources import app_ini
+from utils.iter_utils import EpochSampler
+from utils.zip_utils import zip2
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'mnist')
+# Left by tf.keras.datasets.mnist.load_data
+KERAS_FILE = os.path.join(os.path.expanduser('~'), '.keras', 'datasets', 'mnist.npz')
+URL = 'https://storage.googleapis.com/tensorflow/tf-keras-datasets/mnist.npz'
+
+# Images stay bytes and labels class ids; they are scaled and vectorized per batch
+_RAW_DTYPES = {'train_x': np.uint8, 'train_y': np.int8, 'test_x': np.uint8, 'test_y': np.int8}
+_NAMES = tuple(_RAW_DTYPES)
+_IDX_FILES = {
+    'train_x': 'train-images-idx3-ubyte',
+    'train_y': 'train-labels-idx1-ubyte',
+    'test_x': 't10k-images-idx3-ubyte',
+    'test_y': 't10k-labels-idx1-ubyte',
+}
+_NPZ_KEYS = {'train_x': 'x_train', 'train_y': 'y_train', 'test_x': 'x_test', 'test_y': 'y_test'}
+_IDX_UINT8 = 0x08
 
 
 # [0, 255] -> [0, 1]
-def scale(x: np.ndarray):
-    return x / 255
+def scale(x: np.ndarray, dtype=np.float64, out: np.ndarray = None):
+    if out is not None:
+        return np.divide(x, 255, out=out, dtype=out.dtype)
+    return np.divide(x, 255, dtype=dtype)
 
 
 # [0, 1] -> [0, 255]
@@ -13,8 +42,9 @@ def unscale(x: np.ndarray):
 
 
 # 3 -> [0, 0, 0, 1, 0, 0, 0, 0, 0, 0]
-def vectorize(y: np.ndarray):
-    y_vec = np.zeros((y.size, 10), dtype=float)
+def vectorize(y: np.ndarray, dtype=np.float64, out: np.ndarray = None):
+    y_vec = out if out is not None else np.empty((y.size, 10), dtype=dtype)
+    y_vec.fill(0)
     y_vec[np.arange(len(y)), y] = 1
     return y_vec
 
@@ -29,6 +59,191 @@ def unvectorize(y: np.ndarray):
         raise ValueError('Y must be 1D or 2D numpy array')
 
 
-(raw_train_x, raw_train_y), (raw_test_x, raw_test_y) = tf.keras.datasets.mnist.load_data()
-train_x, test_x = scale(raw_train_x), scale(raw_test_x)
-train_y, test_y = vectorize(raw_train_y), vectorize(raw_test_y)
+def parse_idx(data: bytes) -> np.ndarray:
+    zero, dtype_code, ndim = struct.unpack('>HBB', data[:4])
+    if zero != 0 or dtype_code != _IDX_UINT8:
+        raise ValueError(f'Only IDX files of unsigned bytes are supported. Got header: {data[:4].hex()}')
+    shape = struct.unpack(f'>{ndim}I', data[4:4 + 4 * ndim])
+    return np.frombuffer(data, dtype=np.uint8, offset=4 + 4 * ndim).reshape(shape)
+
+
+def _read_idx(file: str) -> np.ndarray:
+    opener = gzip.open if file.endswith('.gz') else open
+    with opener(file, 'rb') as f:
+        return parse_idx(f.read())
+
+
+def _find_idx_files() -> dict[str, str] | None:
+    files = {}
+    for name, idx_file in _IDX_FILES.items():
+        candidates = [os.path.join(DATA_DIR, idx_file + ext) for ext in ('', '.gz')]
+        existing = [c for c in candidates if os.path.exists(c)]
+        if not existing:
+            return None
+        files[name] = existing[0]
+    return files
+
+
+def _find_npz_file() -> str | None:
+    return next((f for f in (os.path.join(DATA_DIR, 'mnist.npz'), KERAS_FILE) if os.path.exists(f)), None)
+
+
+# IDX files in DATA_DIR, else mnist.npz in DATA_DIR or the Keras cache
+def _read_sources() -> dict[str, np.ndarray]:
+    idx_files = _find_idx_files()
+    if idx_files is not None:
+        return {name: _read_idx(file) for name, file in idx_files.items()}
+
+    npz_file = _find_npz_file()
+    if npz_file is None:
+        raise FileNotFoundError(f'MNIST was not found. Put its IDX files or mnist.npz in {DATA_DIR}, '
+                                f'or download it by: python data_set.py --download')
+    with np.load(npz_file) as npz:
+        return {name: npz[key] for name, key in _NPZ_KEYS.items()}
+
+
+# Downloads mnist.npz into DATA_DIR
+def download():
+    os.makedirs(DATA_DIR, exist_ok=True)
+    npz_file = os.path.join(DATA_DIR, 'mnist.npz')
+    print(f'Downloading {URL} to {npz_file}')
+    urllib.request.urlretrieve(URL, npz_file + '.tmp')
+    os.replace(npz_file + '.tmp', npz_file)
+
+
+def _cache_file(name: str) -> str:
+    return os.path.join(DATA_DIR, f'{name}.npy')
+
+
+def _build_cache():
+    arrays = _read_sources()
+    for prefix in ('train', 'test'):
+        x, y = arrays[f'{prefix}_x'], arrays[f'{prefix}_y']
+        if len(x) != len(y):
+            raise ValueError(f'{prefix.capitalize()} images and labels counts must match. Got: {len(x)}, {len(y)}')
+    os.makedirs(DATA_DIR, exist_ok=True)
+    for name, array in arrays.items():
+        file = _cache_file(name)
+        with open(file + '.tmp', 'wb') as f:
+            np.save(f, array.astype(_RAW_DTYPES[name], copy=False))
+        os.replace(file + '.tmp', file)
+
+
+def _is_cached() -> bool:
+    return all(os.path.exists(_cache_file(name)) and np.load(_cache_file(name), mmap_mode='r').dtype == raw_dtype
+               for name, raw_dtype in _RAW_DTYPES.items())
+
+
+# Whether this process found or built the cache, so that it is checked once
+_cache_checked = False
+
+
+def _ensure_cache():
+    global _cache_checked
+    if not _cache_checked:
+        if not _is_cached():
+            _build_cache()
+        _cache_checked = True
+
+
+# uint8 images or int8 label ids of the cache, memory-mapped read only; the cache is built on first use
+def load_raw(name: str) -> np.ndarray:
+    if name not in _NAMES:
+        raise ValueError(f'Invalid data set array: {name}. Expected one of: {", ".join(_NAMES)}')
+    _ensure_cache()
+    return np.load(_cache_file(name), mmap_mode='r')
+
+
+# Lazily transformed view of a cached raw array: indexing transforms the selected rows only, np.asarray
+# transforms all. Pickled by name, so other processes map the cache instead of receiving a copy
+class LazyArray:
+    def __init__(self, name: str, transform: Callable, dtype) -> None:
+        self._name = name
+        self._transform = transform
+        self.dtype = np.dtype(dtype)
+        self._raw = load_raw(name)
+        self.shape = (len(self._raw), *self[:1].shape[1:])
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __getitem__(self, item) -> np.ndarray:
+        if isinstance(item, (int, np.integer)):
+            return self[[item]][0]
+        return self._transform(self._raw[item], self.dtype)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    # Transforms the rows into out, which has a row per index
+    def take(self, indices: np.ndarray, out: np.ndarray) -> np.ndarray:
+        return self._transform(self._raw[indices], out=out)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = self._transform(self._raw, self.dtype)
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+    def __reduce__(self):
+        return LazyArray, (self._name, self._transform, self.dtype)
+
+
+dtype = np.dtype(app_ini.cfg.ai.dtype.value)
+_TRANSFORMS = {'train_x': scale, 'train_y': vectorize, 'test_x': scale, 'test_y': vectorize}
+
+
+def _get(name: str):
+    if name not in globals():
+        globals()[name] = load_raw(name[4:]) if name.startswith('raw_') else LazyArray(name, _TRANSFORMS[name], dtype)
+    return globals()[name]
+
+
+# Data set arrays are created on first access: raw_<name> as the uint8 cache, <name> as a lazily scaled
+# or vectorized view of it
+def __getattr__(name: str):
+    if name in _TRANSFORMS or name.startswith('raw_') and name[4:] in _NAMES:
+        return _get(name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+# Gathers the sample rows of every train step into float buffers reused while the batch size doesn't grow.
+# Returned arrays are valid until the next load
+class BatchLoader:
+    def __init__(self, arrays: tuple[LazyArray | np.ndarray, ...]) -> None:
+        self._arrays = arrays
+        self._buffers = None
+
+    def load(self, indices: np.ndarray) -> tuple[np.ndarray, ...]:
+        n = len(indices)
+        if self._buffers is None or n > len(self._buffers[0]):
+            self._buffers = [np.empty((n, *a.shape[1:]), dtype=a.dtype) for a in self._arrays]
+        return tuple(a.take(indices, out=b[:n]) if isinstance(a, LazyArray) else np.take(a, indices, axis=0, out=b[:n])
+                     for a, b in zip(self._arrays, self._buffers))
+
+
+# Train steps get sample indices from the sampler, resolved against the train set by the trainer and the UI.
+# chunk_count 0 trains until stopped. Test data are pairs of uint8 images and label ids
+def prepare_data(chunk_size, chunk_count, seed: int | None = None):
+    test_data = list(zip2(_get('raw_test_x'), _get('raw_test_y')))
+    sampler = EpochSampler(len(_get('raw_train_y')), chunk_size, chunk_count or None, seed)
+    np.random.shuffle(test_data)
+    return sampler, test_data
+
+
+# Builds the cache, downloading MNIST first if asked and no local copy is found
+def main():
+    parser = argparse.ArgumentParser(description=f'Builds the MNIST cache in {DATA_DIR}')
+    parser.add_argument('--download', action='store_true',
+                        help=f'download mnist.npz from {URL} if no local copy is found')
+    args = parser.parse_args()
+    if args.download and _find_idx_files() is None and _find_npz_file() is None:
+        download()
+    _ensure_cache()
+
+
+if __name__ == '__main__':
+    main()
@@ -33,6 +33,9 @@ def get_activation_function_inv(func: ActivationFunction, relu_approx_factor=3)
         return FormulaFunction(sigmoid_inv, domain=(0.00001, 0.99999))
     elif func == ActivationFunction.RELU:
         return FormulaFunction(get_relu_inv_approx_func(relu_approx_factor), domain=(0.00001, +np.inf))
+    elif func == ActivationFunction.SOFTMAX:
+        raise ValueError('Softmax is not supported by the distribution viewer: it is not element-wise, '
+                         'so layer output distributions can\'t be derived per neuron')
     raise ValueError(f'Invalid activation function: {func}')
 
 
@@ -41,6 +44,9 @@ def get_activation_function_der(func: ActivationFunction, relu_approx_factor=3)
         return FormulaFunction(sigmoid_der)
     elif func == ActivationFunction.RELU:
         return FormulaFunction(get_relu_der_approx_func(relu_approx_factor))
+    elif func == ActivationFunction.SOFTMAX:
+        raise ValueError('Softmax is not supported by the distribution viewer: it is not element-wise, '
+                         'so layer output distributions can\'t be derived per neuron')
     raise ValueError(f'Invalid activation function: {func}')
 
 
@@ -60,7 +66,7 @@ def get_distribution_function(func: Distribution) -> FormulaFunction:
 def run_distribution_viewer():
     cfg = app_ini.cfg.ai
     domain = np.linspace(-5, +5, 1000)
-    train_data = train_x.flatten()
+    train_data = np.asarray(train_x).flatten()
     layer_params = get_layer_params(cfg)
     with TimeLog('Distributions calculation') as _:
         layer_distributions = calc_distributions(domain, train_data, layer_params)
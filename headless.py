@@ -0,0 +1,122 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from timeit import default_timer as timer
+
+import numpy as np
+
+import ai
+from ai_factory import create_ai
+from control import TrainControl
+from data_set import train_x, train_y, raw_test_x, raw_test_y, prepare_data, scale
+from metric_log import MetricLogWriter
+from metrics import MetricReducer
+from resources import app_ini
+from resources.app_ini import str_to_learning_rates, str_to_metric_detail
+from training import train, create_control
+
+DEFAULT_LOG_DIR = 'runs'
+
+
+# Metric queue replacement for training in the calling process. Prints throughput and the mean cost
+# every interval seconds and passes the metrics on to the sink, if any
+class ProgressSink:
+    def __init__(self, sink=None, interval=5.) -> None:
+        self._sink = sink
+        self._interval = interval
+        self._begin = self._report_time = timer()
+        self._report_data_used = 0
+        self._steps = 0
+        self._costs = []
+        self.data_used = 0
+
+    def put(self, metric: ai.TrainMetric | None):
+        if self._sink is not None:
+            self._sink.put(metric)
+        if metric is None:
+            self._report(timer())
+            return
+        self._steps += 1
+        self._costs.append(metric.cost)
+        self.data_used = metric.data_used
+        now = timer()
+        if now - self._report_time >= self._interval:
+            self._report(now)
+
+    def flush(self):
+        if self._sink is not None:
+            self._sink.flush()
+
+    def _report(self, now: float):
+        elapsed = now - self._report_time
+        samples = self.data_used - self._report_data_used
+        cost = np.mean(self._costs) if self._costs else np.nan
+        print(f'{now - self._begin:8.1f}s  steps: {self._steps:>7}  data used: {self.data_used:>9}  '
+              f'samples/s: {samples / elapsed if elapsed else 0:>9.0f}  cost: {cost:.5f}', flush=True)
+        self._report_time = now
+        self._report_data_used = self.data_used
+        self._costs.clear()
+
+
+# Sends the commands read from stdin: pause, resume, stop, lr <cost: rate, ...>, detail <Scalars|Summary|Full>
+def read_commands(control: TrainControl):
+    for line in sys.stdin:
+        command, _, arg = line.strip().partition(' ')
+        try:
+            if command == 'pause':
+                control.pause()
+            elif command == 'resume':
+                control.resume()
+            elif command == 'stop':
+                control.stop()
+            elif command == 'lr':
+                control.set_learning_rate(str_to_learning_rates(arg))
+            elif command == 'detail':
+                control.set_metric_detail(str_to_metric_detail(arg))
+            elif command:
+                print(f'Unknown command: {command}. Expected: pause, resume, stop, lr, detail', flush=True)
+        except (ValueError, KeyError, IndexError):
+            print(f'Invalid {command} argument: {arg}', flush=True)
+
+
+def parse_args():
+    processing = app_ini.cfg.processing
+    parser = argparse.ArgumentParser(description='Trains the AI configured in resources/app.ini without the UI')
+    parser.add_argument('--log-dir', default=processing.metric_log_dir or DEFAULT_LOG_DIR,
+                        help='directory of the run metric logs')
+    parser.add_argument('--no-log', action='store_true', help="don't write a metric log")
+    parser.add_argument('--report-interval', type=float, default=5., help='seconds between progress lines')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    cfg = app_ini.cfg
+
+    sampler, _ = prepare_data(cfg.train.chunk_size, cfg.train.chunk_count, cfg.train.seed)
+    ai_model = create_ai(cfg.ai)
+
+    writer = None
+    if not args.no_log:
+        path = os.path.join(args.log_dir, time.strftime('run-%Y%m%d-%H%M%S'))
+        writer = MetricLogWriter(path, ai_model.layout, sampler.batch_size, ai_model.dtype)
+        print(f'Metric log: {path}')
+    sink = ProgressSink(writer, args.report_interval)
+    reducer = MetricReducer(cfg.processing.metric_detail, cfg.processing.full_metric_interval)
+    control = create_control(cfg.processing.train_workers, cfg.processing.parallel_mode)
+    threading.Thread(target=read_commands, args=(control,), daemon=True).start()
+    try:
+        train(sink, (train_x, train_y), sampler, ai_model, cfg.processing.train_workers,
+              cfg.processing.parallel_mode, reducer, control)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    _, guesses = ai_model.predict(scale(raw_test_x, ai_model.dtype), validate=False)
+    print(f'Test accuracy: {np.mean(guesses == raw_test_y):.4f}')
+
+
+if __name__ == '__main__':
+    main()
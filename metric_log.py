@@ -0,0 +1,282 @@
+import functools
+import json
+import os
+
+import numpy as np
+
+import ai
+from metrics import ARRAY_FIELDS, STATS_FIELDS, get_array_shapes
+from utils.array_utils import SumPyramid
+
+_INDEX_FILE = 'index.json'
+# Sent with every metric
+_SCALAR_COLUMNS = ('data_used', 'gradient_len', 'cost', 'rows')
+# Columns with block sums of their rows, so range sums are read from the log instead of kept in memory
+SUM_FIELDS = ('params', 'gradient')
+SUM_BLOCK_SIZE = 16
+
+
+# Dtypes and row shapes of the columns. Each metric array field has a companion '<field>.step' column
+# with the numbers of the metrics that had it
+def _column_specs(layout: ai.ParamLayout, chunk_size: int, dtype) -> dict[str, tuple[np.dtype, tuple[int, ...]]]:
+    f8, i8, i4 = np.dtype(np.float64), np.dtype(np.int64), np.dtype(np.int32)
+    dtypes = {**{name: f8 for name in STATS_FIELDS}, 'indices': i4}
+    specs = {'data_used': (i8, ()), 'gradient_len': (f8, ()), 'cost': (f8, ()), 'rows': (i4, ())}
+    for name, shape in get_array_shapes(layout, chunk_size).items():
+        specs[name] = (dtypes.get(name, np.dtype(dtype)), shape)
+        specs[f'{name}.step'] = (i8, ())
+    return specs
+
+
+def _segment_file(path: str, name: str, segment: int) -> str:
+    return os.path.join(path, name, f'{segment:06d}.npy')
+
+
+class _ColumnWriter:
+    def __init__(self, path: str, name: str, dtype: np.dtype, shape: tuple[int, ...], segment_size: int) -> None:
+        self._path = path
+        self._name = name
+        self._dtype = dtype
+        self._shape = shape
+        self._segment_size = segment_size
+        self._segment: np.memmap | None = None
+        self.rows = 0
+        os.makedirs(os.path.join(path, name))
+
+    def append(self, value):
+        pos = self.rows % self._segment_size
+        if pos == 0:
+            self.sync()
+            file = _segment_file(self._path, self._name, self.rows // self._segment_size)
+            self._segment = np.lib.format.open_memmap(file, mode='w+', dtype=self._dtype,
+                                                      shape=(self._segment_size, *self._shape))
+        self._segment[pos] = value
+        self.rows += 1
+
+    def sync(self):
+        if self._segment is not None:
+            self._segment.flush()
+
+    def close(self):
+        self.sync()
+        self._segment = None
+
+
+# Appends metrics of one run to a directory of fixed dtype .npy segments, one subdirectory per column.
+# index.json describes the columns and how many rows of them are written; it is replaced on every flush,
+# so readers see whole metrics only. Readers on the same machine see the rows through the page cache,
+# segments are synced to disk when full and on close. Per sample arrays are padded to chunk_size rows.
+# The rows of SUM_FIELDS columns are summed by a pyramid whose level k is the column '<field>.sum<k>'
+class MetricLogWriter:
+    def __init__(self, path: str, layout: ai.ParamLayout, chunk_size: int, dtype, segment_size=1024,
+                 flush_interval=100) -> None:
+        os.makedirs(path)
+        self.path = path
+        self._layout = layout
+        self._chunk_size = chunk_size
+        self._segment_size = segment_size
+        self._flush_interval = flush_interval
+        self._specs = _column_specs(layout, chunk_size, dtype)
+        self._columns = {name: _ColumnWriter(path, name, dtype, shape, segment_size)
+                         for name, (dtype, shape) in self._specs.items()}
+        self._sums = {name: SumPyramid(self._specs[name][1], self._specs[name][0], SUM_BLOCK_SIZE,
+                                       functools.partial(self._add_sum_column, name)) for name in SUM_FIELDS}
+        self._closed = False
+        self.flush()
+
+    def _add_sum_column(self, name: str, k: int) -> '_ColumnWriter':
+        column = f'{name}.sum{k}'
+        self._specs[column] = self._specs[name]
+        self._columns[column] = _ColumnWriter(self.path, column, *self._specs[name], self._segment_size)
+        return self._columns[column]
+
+    def __len__(self):
+        return self._columns['data_used'].rows
+
+    # Writes a metric, or closes the log on None, so the writer can stand in for a metric queue
+    def put(self, metric: ai.TrainMetric | None):
+        if metric is None:
+            self.close()
+            return
+        if self._closed:
+            raise ValueError(f'Metric log is closed: {self.path}')
+        step = len(self)
+        rows = 0
+        for name, by_rows in ARRAY_FIELDS:
+            value = getattr(metric, name)
+            if value is None:
+                continue
+            if by_rows:
+                rows = len(value)
+                padded = np.zeros(self._specs[name][1], dtype=self._specs[name][0])
+                padded[:rows] = np.reshape(value, (rows, *padded.shape[1:]))
+                value = padded
+            self._columns[name].append(value)
+            self._columns[f'{name}.step'].append(step)
+            if name in self._sums:
+                self._sums[name].append(value)
+        for name, value in zip(_SCALAR_COLUMNS, (metric.data_used, metric.gradient_len, metric.cost, rows)):
+            self._columns[name].append(value)
+        if len(self) % self._flush_interval == 0:
+            self.flush()
+
+    def flush(self):
+        index = {
+            'segment_size': self._segment_size,
+            'chunk_size': self._chunk_size,
+            'sum_block_size': SUM_BLOCK_SIZE,
+            'w_shapes': self._layout.w_shapes,
+            'b_shapes': self._layout.b_shapes,
+            'closed': self._closed,
+            'columns': {name: {'dtype': dtype.str, 'shape': shape, 'rows': self._columns[name].rows}
+                        for name, (dtype, shape) in self._specs.items()},
+        }
+        file = os.path.join(self.path, _INDEX_FILE)
+        with open(file + '.tmp', 'w') as f:
+            json.dump(index, f)
+        os.replace(file + '.tmp', file)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        for column in self._columns.values():
+            column.close()
+
+
+# Rows of a column across its memory-mapped segments
+class SegmentedColumn:
+    def __init__(self, path: str, name: str, dtype: np.dtype, shape: tuple[int, ...], rows: int,
+                 segment_size: int) -> None:
+        self._path = path
+        self._name = name
+        self._dtype = dtype
+        self._shape = shape
+        self.rows = rows
+        self._segment_size = segment_size
+        self._segments: dict[int, np.ndarray] = {}
+
+    def __len__(self):
+        return self.rows
+
+    def _get_segment(self, segment: int) -> np.ndarray:
+        if segment not in self._segments:
+            self._segments[segment] = np.load(_segment_file(self._path, self._name, segment), mmap_mode='r')
+        return self._segments[segment]
+
+    # A view into the mapped segment for an index, a copy for a slice
+    def __getitem__(self, item: int | slice) -> np.ndarray:
+        if isinstance(item, slice):
+            left, right, step = item.indices(self.rows)
+            if step != 1:
+                raise ValueError('Column slices must be contiguous')
+            parts = [self._get_segment(s)[max(left - s * self._segment_size, 0):right - s * self._segment_size]
+                     for s in range(left // self._segment_size, (right - 1) // self._segment_size + 1)]
+            return np.concatenate(parts) if left < right else np.empty((0, *self._shape), dtype=self._dtype)
+        if not -self.rows <= item < self.rows:
+            raise IndexError(f'Row {item} is out of range of {self.rows} rows')
+        item %= self.rows
+        return self._get_segment(item // self._segment_size)[item % self._segment_size]
+
+
+# Reads a metric log written by MetricLogWriter, possibly while it is still written; refresh picks up new rows
+class MetricLog:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._columns: dict[str, SegmentedColumn] = {}
+        self._steps: dict[str, np.ndarray] = {}
+        self.refresh()
+
+    def refresh(self):
+        with open(os.path.join(self.path, _INDEX_FILE)) as f:
+            index = json.load(f)
+        self.layout = ai.ParamLayout(index['w_shapes'], index['b_shapes'])
+        self.closed = index['closed']
+        # None for logs written without sum columns
+        self.sum_block_size = index.get('sum_block_size')
+        for name, spec in index['columns'].items():
+            if name in self._columns:
+                self._columns[name].rows = spec['rows']
+            else:
+                self._columns[name] = SegmentedColumn(self.path, name, np.dtype(spec['dtype']), tuple(spec['shape']),
+                                                      spec['rows'], index['segment_size'])
+
+    def __len__(self):
+        return len(self._columns['data_used'])
+
+    def column(self, name: str) -> SegmentedColumn:
+        return self._columns[name]
+
+    # Sorted numbers of the metrics that had the optional column, in the order of its rows. Step columns are
+    # only appended to, so the cached ones are extended with the rows added since
+    def steps(self, name: str) -> np.ndarray:
+        steps = self._steps.get(name, np.empty(0, dtype=np.int64))
+        column = self._columns[f'{name}.step']
+        if len(steps) < len(column):
+            steps = self._steps[name] = np.concatenate((steps, column[len(steps):]))
+        return steps
+
+    # Rows of a per sample column of the metrics in [left, right) that had it, without the padding, and the
+    # number of the metric of every row
+    def sample_rows(self, name: str, left: int, right: int) -> tuple[np.ndarray, np.ndarray]:
+        steps = self.steps(name)
+        first, last = np.searchsorted(steps, (left, right))
+        steps = steps[first:last]
+        values = self._columns[name][int(first):int(last)]
+        rows = self._columns['rows'][left:right][steps - left] if len(steps) else np.empty(0, dtype=np.int32)
+        mask = np.arange(values.shape[1]) < rows[:, np.newaxis]
+        return values[mask], np.repeat(steps, rows)
+
+    # Pyramid levels of block sums of a SUM_FIELDS column, see get_range_sum
+    def sum_levels(self, name: str) -> list[SegmentedColumn]:
+        levels = []
+        while f'{name}.sum{len(levels)}' in self._columns:
+            levels.append(self._columns[f'{name}.sum{len(levels)}'])
+        return levels
+
+    # Value of an optional column for the metric number step, None if the metric was sent without it
+    def find(self, name: str, step: int) -> np.ndarray | None:
+        steps = self.steps(name)
+        pos = np.searchsorted(steps, step)
+        if pos == len(steps) or steps[pos] != step:
+            return None
+        return self._columns[name][int(pos)]
+
+    # Weight and bias views of the params or gradient of the metric number step, None if it was sent without them
+    def find_views(self, name: str, step: int) -> tuple[tuple[np.ndarray, ...], tuple[np.ndarray, ...]] | None:
+        flat = self.find(name, step)
+        return self.layout.views(flat) if flat is not None else None
+
+    # Metrics with arrays viewing the mapped segments
+    def metric(self, step: int) -> ai.TrainMetric:
+        rows = int(self._columns['rows'][step])
+        fields = {}
+        for name, by_rows in ARRAY_FIELDS:
+            value = self.find(name, step)
+            if value is not None:
+                fields[name] = value[:rows] if by_rows else value
+        if 'params' in fields or 'gradient' in fields:
+            fields['layout'] = self.layout
+        return ai.TrainMetric(data_used=int(self._columns['data_used'][step]),
+                              gradient_len=float(self._columns['gradient_len'][step]),
+                              cost=float(self._columns['cost'][step]), **fields)
+
+
+# Hands out the metrics of a log in batches like a metric queue, so a recorded run can be shown by the UI
+class MetricLogQueue:
+    def __init__(self, log: MetricLog, batch_size: int) -> None:
+        self._log = log
+        self._batch_size = batch_size
+        self._pos = 0
+
+    def get(self, block=True, timeout=None) -> tuple[ai.TrainMetric, ...] | None:
+        right = min(self._pos + self._batch_size, len(self._log))
+        if self._pos == right:
+            return None
+        batch = tuple(self._log.metric(step) for step in range(self._pos, right))
+        self._pos = right
+        return batch
+
+    def close(self):
+        pass
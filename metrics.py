@@ -0,0 +1,87 @@
+import dataclasses
+
+import numpy as np
+
+import ai
+from resources.app_ini import MetricDetail
+
+
+# Metric array fields and whether they have one row per sample
+ARRAY_FIELDS = (
+    ('params', False),
+    ('gradient', False),
+    ('w_stats', False),
+    ('b_stats', False),
+    ('w_gradient_stats', False),
+    ('b_gradient_stats', False),
+    ('costs', True),
+    ('inputs', True),
+    ('outputs', True),
+    ('expected', True),
+    ('indices', True),
+)
+STATS_FIELDS = ('w_stats', 'b_stats', 'w_gradient_stats', 'b_gradient_stats')
+
+
+# Shapes of the array fields of metrics from chunks of up to chunk_size samples
+def get_array_shapes(layout: ai.ParamLayout, chunk_size: int) -> dict[str, tuple[int, ...]]:
+    depth, n = len(layout.w_shapes), chunk_size
+    input_size, output_size = layout.w_shapes[0][1], layout.w_shapes[-1][0]
+    return {
+        'params': (layout.size,),
+        'gradient': (layout.size,),
+        **{name: (depth, 3) for name in STATS_FIELDS},
+        'costs': (n, output_size),
+        'inputs': (n, input_size),
+        'outputs': (n, output_size),
+        'expected': (n, output_size),
+        'indices': (n,),
+    }
+
+
+# Size, mean and sd of every array
+def get_stats(arrays: tuple[np.ndarray, ...]) -> np.ndarray:
+    return np.array([[a.size, np.mean(a), np.std(a)] for a in arrays], dtype=np.float64)
+
+
+# Keeps scalars and stats, drops parameters, gradients and per sample arrays
+def strip_snapshot(metric: ai.TrainMetric) -> ai.TrainMetric:
+    return dataclasses.replace(metric, layout=None, params=None, gradient=None, costs=None, inputs=None,
+                               outputs=None, expected=None, indices=None)
+
+
+# Turns live train metrics into what is sent to the UI, copying only the fields of the detail level.
+# Every full_interval-th metric is kept in full regardless of the level; 0 disables it.
+# With train set indices of the samples, they are sent instead of the inputs and expected outputs
+class MetricReducer:
+    def __init__(self, detail=MetricDetail.FULL, full_interval=0) -> None:
+        if full_interval < 0:
+            raise ValueError(f'Full metric interval must not be negative. Got: {full_interval}')
+        self.detail = detail
+        self.full_interval = full_interval
+        self._count = 0
+
+    def reduce(self, metric: ai.TrainMetric, indices: np.ndarray = None) -> ai.TrainMetric:
+        self._count += 1
+        detail = self.detail
+        if self.full_interval and self._count % self.full_interval == 0:
+            detail = MetricDetail.FULL
+
+        m = metric
+        scalars = dict(data_used=m.data_used, gradient_len=float(m.gradient_len), cost=float(m.cost))
+        if detail is MetricDetail.SCALARS:
+            return ai.TrainMetric(**scalars)
+
+        samples = dict(indices=np.array(indices, dtype=np.int32)) if indices is not None \
+            else dict(expected=np.array(m.expected))
+        summary = dict(
+            w_stats=get_stats(m.w), b_stats=get_stats(m.b),
+            w_gradient_stats=get_stats(m.w_gradient), b_gradient_stats=get_stats(m.b_gradient),
+            costs=np.array(m.costs), outputs=np.array(m.outputs), **samples
+        )
+        if detail is MetricDetail.SUMMARY:
+            return ai.TrainMetric(**scalars, **summary)
+
+        inputs = dict(inputs=np.array(m.inputs)) if indices is None else {}
+        return ai.TrainMetric(**scalars, **summary, layout=m.layout, params=np.copy(m.params),
+                              gradient=np.copy(m.gradient), **inputs)
@@ -0,0 +1,119 @@
+import numpy as np
+
+from utils.zip_utils import zip3
+
+
+# Updates parameters in place. State buffers are allocated on the first step and reused afterwards
+class Optimizer:
+    def __init__(self) -> None:
+        self._buffers: list[tuple[np.ndarray, ...]] | None = None
+
+    def step(self, params: list[np.ndarray], gradients: list[np.ndarray], learning_rate):
+        if self._buffers is None:
+            self._buffers = [self._create_buffers(p) for p in params]
+        self._begin_step()
+        for p, g, buffers in zip3(params, gradients, self._buffers):
+            self._step(p, g, learning_rate, *buffers)
+
+    def _begin_step(self):
+        pass
+
+    def _create_buffers(self, p: np.ndarray) -> tuple[np.ndarray, ...]:
+        return np.empty_like(p),
+
+    def _step(self, p: np.ndarray, g: np.ndarray, learning_rate, *buffers: np.ndarray):
+        pass
+
+
+# p -= lr * g
+class SgdOptimizer(Optimizer):
+
+    def _step(self, p, g, learning_rate, *buffers):
+        step, = buffers
+        np.multiply(g, learning_rate, out=step)
+        p -= step
+
+
+# v = mu * v + g; p -= lr * v
+class MomentumOptimizer(Optimizer):
+    def __init__(self, momentum=0.9) -> None:
+        super().__init__()
+        self.momentum = momentum
+
+    def _create_buffers(self, p):
+        return np.zeros_like(p), np.empty_like(p)
+
+    def _step(self, p, g, learning_rate, *buffers):
+        v, step = buffers
+        v *= self.momentum
+        v += g
+        np.multiply(v, learning_rate, out=step)
+        p -= step
+
+
+# v = mu * v + g; p -= lr * (g + mu * v)
+class NesterovOptimizer(MomentumOptimizer):
+
+    def _step(self, p, g, learning_rate, *buffers):
+        v, step = buffers
+        v *= self.momentum
+        v += g
+        np.multiply(v, self.momentum, out=step)
+        step += g
+        step *= learning_rate
+        p -= step
+
+
+# s = rho * s + (1 - rho) * g^2; p -= lr * g / (sqrt(s) + eps)
+class RmsPropOptimizer(Optimizer):
+    def __init__(self, decay=0.9, eps=1e-8) -> None:
+        super().__init__()
+        self.decay = decay
+        self.eps = eps
+
+    def _create_buffers(self, p):
+        return np.zeros_like(p), np.empty_like(p)
+
+    def _step(self, p, g, learning_rate, *buffers):
+        s, step = buffers
+        s *= self.decay
+        np.square(g, out=step)
+        step *= 1 - self.decay
+        s += step
+        np.sqrt(s, out=step)
+        step += self.eps
+        np.divide(g, step, out=step)
+        step *= learning_rate
+        p -= step
+
+
+# m = b1 * m + (1 - b1) * g; v = b2 * v + (1 - b2) * g^2; p -= lr_t * m / (sqrt(v) + eps)
+# lr_t = lr * sqrt(1 - b2^t) / (1 - b1^t) corrects the zero initialization bias of m and v
+class AdamOptimizer(Optimizer):
+    def __init__(self, beta1=0.9, beta2=0.999, eps=1e-8) -> None:
+        super().__init__()
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.eps = eps
+        self._t = 0
+
+    def _begin_step(self):
+        self._t += 1
+
+    def _create_buffers(self, p):
+        return np.zeros_like(p), np.zeros_like(p), np.empty_like(p)
+
+    def _step(self, p, g, learning_rate, *buffers):
+        m, v, step = buffers
+        m *= self.beta1
+        np.multiply(g, 1 - self.beta1, out=step)
+        m += step
+        v *= self.beta2
+        np.square(g, out=step)
+        step *= 1 - self.beta2
+        v += step
+        np.sqrt(v, out=step)
+        step += self.eps
+        np.divide(m, step, out=step)
+        step *= learning_rate * (1 - self.beta2 ** self._t) ** 0.5 / (1 - self.beta1 ** self._t)
+        p -= step
@@ -0,0 +1,181 @@
+import multiprocessing as mp
+import threading
+
+import numpy as np
+
+import ai
+from control import TrainControl
+from data_set import BatchLoader
+from metrics import MetricReducer
+from utils.iter_utils import EpochSampler
+from utils.shared_memory_utils import SharedArrays
+
+
+# Moves parameters to shared memory
+def _share_ai(ai_model: ai.Ai) -> SharedArrays:
+    params = SharedArrays([ai_model.params.shape], ai_model.dtype)
+    params.flat[...] = ai_model.params
+    ai_model.bind_params(params.flat)
+    return params
+
+
+# Moves parameters back to private memory
+def _unshare_ai(ai_model: ai.Ai, params: SharedArrays):
+    ai_model.bind_params(np.copy(params.flat))
+    params.close()
+
+
+# Rows [left, right) of the batch computed by the worker
+def _get_part(batch_size: int, rank: int, workers: int) -> tuple[int, int]:
+    return batch_size * rank // workers, batch_size * (rank + 1) // workers
+
+
+def _compute_part(ai_model: ai.Ai, rank: int, workers: int, batch_size: int, batch: list[np.ndarray],
+                  gradient_slot: np.ndarray):
+    x, y, outputs, costs = batch
+    left, right = _get_part(batch_size, rank, workers)
+    plan = ai_model.compute_gradient(x[left:right], y[left:right], batch_size=batch_size)
+    outputs[left:right] = plan.a[-1]
+    costs[left:right] = plan.costs
+    gradient_slot[...] = plan.gradient
+
+
+def _run_worker(ai_model: ai.Ai, rank: int, workers: int, params_spec, batch_spec, gradients_spec,
+                barrier: mp.Barrier, batch_size):
+    params = SharedArrays.attach(params_spec)
+    batch = SharedArrays.attach(batch_spec)
+    gradients = SharedArrays.attach(gradients_spec)
+    ai_model.bind_params(params.flat)
+    gradient_slot = gradients.arrays[0][rank]
+    try:
+        while True:
+            barrier.wait()
+            if batch_size.value == 0:
+                break
+            _compute_part(ai_model, rank, workers, batch_size.value, batch.arrays, gradient_slot)
+            barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    except BaseException:
+        barrier.abort()
+        raise
+
+
+# Splits every batch across worker processes. Parameters live in shared memory; each worker writes its part
+# of the gradient into its own row of one (workers, params) array, the rows are summed and the update is applied
+# once, in place.
+# Worker 0 is the calling process
+class DataParallelTrainer:
+    def __init__(self, ai_model: ai.Ai, workers: int, batch_size: int) -> None:
+        if workers < 1:
+            raise ValueError(f'Workers count must be positive. Got: {workers}')
+        self._ai = ai_model
+        self._workers = workers
+        self._max_batch_size = batch_size
+        self._processes = []
+
+    def __enter__(self) -> 'DataParallelTrainer':
+        ai_model, workers, n = self._ai, self._workers, self._max_batch_size
+        input_size, output_size = ai_model.w[0].shape[1], ai_model.w[-1].shape[0]
+
+        self._params = _share_ai(ai_model)
+        self._batch = SharedArrays([(n, input_size), (n, output_size), (n, output_size), (n, output_size)],
+                                   ai_model.dtype)
+        self._gradients = SharedArrays([(workers, ai_model.layout.size)], ai_model.dtype)
+        self._gradient = ai_model.layout.empty(ai_model.dtype)
+        self._barrier = mp.Barrier(workers)
+        self._batch_size = mp.RawValue('i', 0)
+
+        for rank in range(1, workers):
+            args = (ai_model, rank, workers, self._params.spec(), self._batch.spec(), self._gradients.spec(),
+                    self._barrier, self._batch_size)
+            process = mp.Process(target=_run_worker, args=args, daemon=True)
+            process.start()
+            self._processes.append(process)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self._batch_size.value = 0
+            self._barrier.wait()
+        else:
+            self._barrier.abort()
+        for process in self._processes:
+            process.join()
+        self._processes.clear()
+
+        _unshare_ai(self._ai, self._params)
+        self._batch.close()
+        self._gradients.close()
+
+    def train(self,
+              x_vectors: list[np.ndarray] | np.ndarray,
+              y_vectors: list[np.ndarray] | np.ndarray,
+              snapshot=False
+              ) -> ai.TrainMetric:
+        n = len(x_vectors)
+        if n > self._max_batch_size:
+            raise ValueError(f'Batch size must not exceed {self._max_batch_size}. Got: {n}')
+        x, y, outputs, costs = self._batch.arrays
+        x[:n] = np.reshape(x_vectors, (n, -1))
+        y[:n] = np.reshape(y_vectors, (n, -1))
+        self._batch_size.value = n
+
+        self._barrier.wait()
+        _compute_part(self._ai, 0, self._workers, n, self._batch.arrays, self._gradients.arrays[0][0])
+        self._barrier.wait()
+
+        np.sum(self._gradients.arrays[0], axis=0, out=self._gradient)
+        return self._ai.apply_gradient(self._gradient, costs[:n], outputs[:n], x_vectors, y_vectors,
+                                       snapshot=snapshot)
+
+
+def _train_hogwild_part(ai_model: ai.Ai, train_set, sampler, data_used, queue=None,
+                        reducer: MetricReducer = None, control: TrainControl = None):
+    loader = BatchLoader(train_set)
+    for indices in sampler:
+        if control is not None and not control.poll(ai_model, reducer, queue):
+            break
+        with data_used.get_lock():
+            ai_model.data_used = data_used.value
+            data_used.value += len(indices)
+        metric = ai_model.train(*loader.load(indices))
+        if queue is not None:
+            queue.put(reducer.reduce(metric, indices))
+
+
+def _run_hogwild_worker(ai_model: ai.Ai, train_set, sampler, params_spec, data_used, control: TrainControl):
+    params = SharedArrays.attach(params_spec)
+    ai_model.bind_params(params.flat)
+    _train_hogwild_part(ai_model, train_set, sampler, data_used, control=control)
+
+
+# Asynchronous SGD: every process trains on its own shard of the sampler and applies its updates directly
+# to the shared parameters without locks. Only the calling process emits metrics. Every process polls
+# the control, which needs a consumer per worker
+def train_hogwild(queue, train_set: tuple[np.ndarray, np.ndarray], sampler: EpochSampler, ai_model: ai.Ai,
+                  workers: int, reducer: MetricReducer, control: TrainControl = None):
+    if workers < 1:
+        raise ValueError(f'Workers count must be positive. Got: {workers}')
+    if control is not None and control.consumers < workers:
+        raise ValueError(f'Control must have a consumer per worker. Got: {control.consumers} < {workers}')
+    params = _share_ai(ai_model)
+    data_used = mp.Value('q', ai_model.data_used)
+
+    processes = []
+    try:
+        for rank in range(1, workers):
+            worker_control = control.consumer(rank) if control is not None else None
+            args = (ai_model, train_set, sampler.shard(rank, workers), params.spec(), data_used, worker_control)
+            process = mp.Process(target=_run_hogwild_worker, args=args, daemon=True)
+            process.start()
+            processes.append(process)
+        _train_hogwild_part(ai_model, train_set, sampler.shard(0, workers), data_used, queue, reducer, control)
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        _unshare_ai(ai_model, params)
+        ai_model.data_used = data_used.value
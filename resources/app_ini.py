@@ -9,6 +9,23 @@ from enum import Enum
 class ActivationFunction(Enum):
     SIGMOID = 'Sigmoid'
     RELU = 'ReLU'
+    SOFTMAX = 'Softmax'
+
+
+class CostFunction(Enum):
+    SQUARE = 'MSE'
+    CROSS_ENTROPY = 'CrossEntropy'
+
+
+class SparseInput(Enum):
+    AUTO = 'Auto'
+    ON = 'On'
+    OFF = 'Off'
+
+
+class DType(Enum):
+    FLOAT32 = 'float32'
+    FLOAT64 = 'float64'
 
 
 class DistributionType(Enum):
@@ -23,6 +40,49 @@ class DistributionParam(Enum):
     SD = 'sd'
 
 
+class OptimizerType(Enum):
+    SGD = 'SGD'
+    MOMENTUM = 'Momentum'
+    NESTEROV = 'Nesterov'
+    RMSPROP = 'RMSProp'
+    ADAM = 'Adam'
+
+
+class OptimizerParam(Enum):
+    MOMENTUM = 'momentum'
+    DECAY = 'decay'
+    BETA1 = 'beta1'
+    BETA2 = 'beta2'
+
+
+@dataclass(frozen=True)
+class Optimizer:
+    type: OptimizerType
+    params: dict
+
+
+class ParallelMode(Enum):
+    SYNC = 'Sync'
+    HOGWILD = 'Hogwild'
+
+
+class MetricTransport(Enum):
+    QUEUE = 'Queue'
+    SHARED_MEMORY = 'SharedMemory'
+
+
+class BackpressurePolicy(Enum):
+    BLOCK = 'Block'
+    DROP_OLDEST = 'DropOldest'
+    COALESCE = 'Coalesce'
+
+
+class MetricDetail(Enum):
+    SCALARS = 'Scalars'
+    SUMMARY = 'Summary'
+    FULL = 'Full'
+
+
 @dataclass(frozen=True)
 class Distribution:
     type: DistributionType
@@ -33,21 +93,34 @@ class Distribution:
 class AiCfg:
     layers: tuple[int, ...]
     activation_functions: tuple[ActivationFunction, ...]
+    cost_function: CostFunction
     weight_distributions: tuple[Distribution, ...]
     bias_distributions: tuple[Distribution, ...]
     learning_rate: dict[float, float | None]
+    optimizer: Optimizer
+    sparse_input: SparseInput
+    dtype: DType
 
 
 @dataclass(frozen=True)
 class TrainCfg:
     chunk_size: int
     chunk_count: int
+    seed: int | None
 
 
 @dataclass(frozen=True)
 class ProcessingCfg:
     queue_max_size: int
     queue_batch_size: int
+    train_workers: int
+    parallel_mode: ParallelMode
+    metric_transport: MetricTransport
+    backpressure_policy: BackpressurePolicy
+    queue_flush_interval: float
+    metric_detail: MetricDetail
+    full_metric_interval: int
+    metric_log_dir: str
 
 
 @dataclasses.dataclass(frozen=True)
@@ -74,6 +147,21 @@ def str_to_activation_functions(funcs: str):
     return tuple(funcs)
 
 
+def str_to_sparse_input(sparse_input: str):
+    sparse_input_map = {s.value: s for s in SparseInput}
+    return sparse_input_map[sparse_input.strip()]
+
+
+def str_to_dtype(dtype: str):
+    dtype_map = {d.value: d for d in DType}
+    return dtype_map[dtype.strip()]
+
+
+def str_to_cost_function(func: str):
+    func_map = {f.value: f for f in CostFunction}
+    return func_map[func.strip()]
+
+
 def str_to_learning_rates(rates: str):
     rates = split_n_strip(rates)
     rates = [r.split(':') for r in rates]
@@ -103,14 +191,60 @@ def str_to_distributions(ds: str):
     return tuple(ds)
 
 
+def str_to_optimizer(optimizer: str):
+    o_patterns = {
+        OptimizerType.SGD: re.compile(r'SGD'),
+        OptimizerType.MOMENTUM: re.compile(r'Momentum\s*\(\s*(?P<momentum>[\d.]+)\s*\)'),
+        OptimizerType.NESTEROV: re.compile(r'Nesterov\s*\(\s*(?P<momentum>[\d.]+)\s*\)'),
+        OptimizerType.RMSPROP: re.compile(r'RMSProp\s*\(\s*(?P<decay>[\d.]+)\s*\)'),
+        OptimizerType.ADAM: re.compile(r'Adam\s*\(\s*(?P<beta1>[\d.]+),\s*(?P<beta2>[\d.]+)\s*\)'),
+    }
+
+    for o_type, pattern in o_patterns.items():
+        match = pattern.fullmatch(optimizer.strip())
+        if match:
+            props = {k: float(v) for k, v in match.groupdict().items()}
+            return Optimizer(o_type, props)
+
+    raise ValueError(f'Invalid optimizer: {optimizer if optimizer else "<empty string>"}')
+
+
+def str_to_parallel_mode(mode: str):
+    mode_map = {m.value: m for m in ParallelMode}
+    return mode_map[mode.strip()]
+
+
+def str_to_metric_transport(transport: str):
+    transport_map = {t.value: t for t in MetricTransport}
+    return transport_map[transport.strip()]
+
+
+def str_to_backpressure_policy(policy: str):
+    policy_map = {p.value: p for p in BackpressurePolicy}
+    return policy_map[policy.strip()]
+
+
+def str_to_metric_detail(detail: str):
+    detail_map = {d.value: d for d in MetricDetail}
+    return detail_map[detail.strip()]
+
+
+def str_to_seed(seed: str):
+    return int(seed) if seed.strip() else None
+
+
 def _get_ai_args(_cfg: ConfigParser):
     s = _cfg['AI']
     return AiCfg(
         layers=str_to_layers(s.get('layers')),
         activation_functions=str_to_activation_functions(s.get('activation functions')),
+        cost_function=str_to_cost_function(s.get('cost function')),
         weight_distributions=str_to_distributions(s.get('weight distributions')),
         bias_distributions=str_to_distributions(s.get('bias distributions')),
-        learning_rate=str_to_learning_rates(s.get('learning rate'))
+        learning_rate=str_to_learning_rates(s.get('learning rate')),
+        optimizer=str_to_optimizer(s.get('optimizer')),
+        sparse_input=str_to_sparse_input(s.get('sparse input')),
+        dtype=str_to_dtype(s.get('dtype'))
     )
 
 
@@ -118,7 +252,8 @@ def _get_train_args(_cfg: ConfigParser):
     train_section = _cfg['Train']
     return TrainCfg(
         chunk_size=train_section.getint('chunk size'),
-        chunk_count=train_section.getint('chunk count')
+        chunk_count=train_section.getint('chunk count'),
+        seed=str_to_seed(train_section.get('seed', ''))
     )
 
 
@@ -126,7 +261,15 @@ def _get_processing_args(_cfg: ConfigParser):
     processing_section = _cfg['Processing']
     return ProcessingCfg(
         queue_max_size=processing_section.getint('queue max size'),
-        queue_batch_size=processing_section.getint('queue batch size')
+        queue_batch_size=processing_section.getint('queue batch size'),
+        train_workers=processing_section.getint('train workers'),
+        parallel_mode=str_to_parallel_mode(processing_section.get('parallel mode')),
+        metric_transport=str_to_metric_transport(processing_section.get('metric transport')),
+        backpressure_policy=str_to_backpressure_policy(processing_section.get('backpressure policy')),
+        queue_flush_interval=processing_section.getfloat('queue flush interval'),
+        metric_detail=str_to_metric_detail(processing_section.get('metric detail')),
+        full_metric_interval=processing_section.getint('full metric interval'),
+        metric_log_dir=processing_section.get('metric log dir').strip()
     )
 
 
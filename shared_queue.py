@@ -0,0 +1,146 @@
+import multiprocessing as mp
+import queue
+
+import numpy as np
+
+import ai
+from buffered_queue import MetricBuffer
+from metrics import ARRAY_FIELDS, STATS_FIELDS, get_array_shapes
+from resources.app_ini import BackpressurePolicy
+from utils.shared_memory_utils import SharedArrays
+
+_DATA_FIELDS = ('params', 'gradient', 'costs', 'inputs', 'outputs', 'expected')
+# Header: data used, rows, mask of present array fields or _END
+_DATA_USED, _ROWS, _MASK = range(3)
+_END = -1
+# Sequence counters: slots written by the producer and slots released by the consumer
+_WRITTEN, _READ = range(2)
+
+
+# Single producer, single consumer metric queue over a ring of fixed layout slots in shared memory.
+# Metrics are copied into free slots as soon as they are put and handed out as views on get, up to batch_size
+# at once, so nothing is pickled. The views stay valid until the next get, when their slots are given back
+# to the producer
+class SharedMetricQueue(MetricBuffer):
+    def __init__(self, layout: ai.ParamLayout, chunk_size: int, dtype, capacity: int, batch_size: int,
+                 policy=BackpressurePolicy.BLOCK) -> None:
+        super().__init__(batch_size=1, policy=policy)
+        if capacity < batch_size + 1:
+            raise ValueError(f'Capacity must exceed batch size. Got: {capacity} <= {batch_size}')
+        self._layout = layout
+        self._capacity = capacity
+        self._get_size = batch_size
+
+        shapes = get_array_shapes(layout, chunk_size)
+        self._counters = SharedArrays([(2,), (capacity, 3)], np.int64)
+        stats_shapes = [(capacity, *shapes[name]) for name in STATS_FIELDS]
+        self._scalars = SharedArrays([(capacity, 2), *stats_shapes], np.float64)
+        self._data = SharedArrays([(capacity, *shapes[name]) for name in _DATA_FIELDS], dtype)
+        self._indices = SharedArrays([(capacity, *shapes['indices'])], np.int32)
+        self._counters.flat[...] = 0
+        self._filled = mp.Semaphore(0)
+        self._free = mp.Semaphore(capacity)
+        self._init_views()
+        self._read = 0
+        self._ended = False
+
+    def _blocks(self) -> tuple[SharedArrays, ...]:
+        return self._counters, self._scalars, self._data, self._indices
+
+    def _init_views(self):
+        self._seq, self._header = self._counters.arrays
+        self._scalar_values, *stats = self._scalars.arrays
+        self._arrays = {**dict(zip(STATS_FIELDS, stats)), **dict(zip(_DATA_FIELDS, self._data.arrays)),
+                        'indices': self._indices.arrays[0]}
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        for name in ('_seq', '_header', '_scalar_values', '_arrays', '_counters', '_scalars', '_data', '_indices'):
+            del state[name]
+        state['_specs'] = [block.spec() for block in self._blocks()]
+        return state
+
+    def __setstate__(self, state):
+        specs = state.pop('_specs')
+        super().__setstate__(state)
+        self._counters, self._scalars, self._data, self._indices = [SharedArrays.attach(spec) for spec in specs]
+        self._init_views()
+
+    # Writes metrics one by one while there are free slots
+    def _send(self, batch: tuple[ai.TrainMetric, ...] | None, block: bool) -> int:
+        metrics = batch if batch is not None else (None,)
+        for sent, metric in enumerate(metrics):
+            if not self._free.acquire(block):
+                return sent
+            written = int(self._seq[_WRITTEN])
+            slot = written % self._capacity
+            if metric is None:
+                self._header[slot, _MASK] = _END
+            else:
+                self._write(slot, metric)
+            self._seq[_WRITTEN] = written + 1
+            self._filled.release()
+        return len(metrics)
+
+    def _write(self, slot: int, metric: ai.TrainMetric):
+        header = self._header[slot]
+        mask, rows = 0, 0
+        for bit, (name, by_rows) in enumerate(ARRAY_FIELDS):
+            value = getattr(metric, name)
+            if value is None:
+                continue
+            mask |= 1 << bit
+            array = self._arrays[name][slot]
+            if by_rows:
+                rows = len(value)
+                array = array[:rows]
+            np.copyto(array, np.reshape(value, array.shape), casting='same_kind')
+        header[_DATA_USED], header[_ROWS], header[_MASK] = metric.data_used, rows, mask
+        self._scalar_values[slot] = metric.gradient_len, metric.cost
+
+    # Returns up to batch_size metrics, or None after the producer put None
+    def get(self, block=True, timeout=None) -> tuple[ai.TrainMetric, ...] | None:
+        self._release()
+        if self._ended:
+            return None
+        if not self._filled.acquire(block, timeout):
+            raise queue.Empty
+        count = 1
+        while count < self._get_size and self._filled.acquire(block=False):
+            count += 1
+
+        metrics = []
+        for seq in range(self._read, self._read + count):
+            slot = seq % self._capacity
+            if self._header[slot, _MASK] == _END:
+                # Nothing is put after the end, so it is the last taken slot
+                self._ended = True
+                break
+            metrics.append(self._read_slot(slot))
+        self._read += count
+        if not metrics:
+            self._release()
+            return None
+        return tuple(metrics)
+
+    # Gives the slots handed out by the previous get back to the producer
+    def _release(self):
+        for _ in range(self._read - int(self._seq[_READ])):
+            self._free.release()
+        self._seq[_READ] = self._read
+
+    def _read_slot(self, slot: int) -> ai.TrainMetric:
+        data_used, rows, mask = self._header[slot]
+        gradient_len, cost = self._scalar_values[slot]
+        fields = {}
+        for bit, (name, by_rows) in enumerate(ARRAY_FIELDS):
+            if mask & (1 << bit):
+                array = self._arrays[name][slot]
+                fields[name] = array[:rows] if by_rows else array
+        if 'params' in fields or 'gradient' in fields:
+            fields['layout'] = self._layout
+        return ai.TrainMetric(data_used=int(data_used), gradient_len=float(gradient_len), cost=float(cost), **fields)
+
+    def close(self):
+        for block in self._blocks():
+            block.close()
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+import ai
+
+
+def _create_ai(sparse_input, dtype=np.float64) -> ai.Ai:
+    rng = np.random.default_rng(0)
+    weights = (rng.normal(0, 0.1, (8, 20)).astype(dtype), rng.normal(0, 0.1, (3, 8)).astype(dtype))
+    biases = (rng.normal(0, 0.1, 8).astype(dtype), rng.normal(0, 0.1, 3).astype(dtype))
+    return ai.Ai(weights, biases, activation_functions=(ai.ReLuFunc(), ai.SigmoidFunc()), learning_rate=0.1,
+                 sparse_input=sparse_input)
+
+
+# Gradient of the mean cost, backpropagated sample by sample with plain loops
+def _reference_gradient(model: ai.Ai, x: np.ndarray, y: np.ndarray) -> tuple[list[np.ndarray], list[np.ndarray]]:
+    w_gradient = [np.zeros_like(w) for w in model.w]
+    b_gradient = [np.zeros_like(b) for b in model.b]
+    for xs, ys in zip(x, y):
+        activations, zs = [xs], []
+        for w, b, f in zip(model.w, model.b, model.f):
+            zs.append(w @ activations[-1] + b)
+            activations.append(f.of_vec(zs[-1]))
+        a = activations[-1]
+        if isinstance(model.cost_function, ai.CrossEntropyCostFunc):
+            delta = a - ys
+        else:
+            delta = 2 * (a - ys) * _derivative(model.f[-1], zs[-1])
+        for layer in reversed(range(len(model.w))):
+            if layer != len(model.w) - 1:
+                delta = (model.w[layer + 1].T @ delta) * _derivative(model.f[layer], zs[layer])
+            w_gradient[layer] += np.outer(delta, activations[layer]) / len(x)
+            b_gradient[layer] += delta / len(x)
+    return w_gradient, b_gradient
+
+
+def _derivative(f: ai.ActivationFunction, z: np.ndarray) -> np.ndarray:
+    if isinstance(f, ai.ReLuFunc):
+        return (z > 0).astype(z.dtype)
+    s = 1 / (1 + np.exp(-z))
+    return s * (1 - s)
+
+
+@pytest.mark.parametrize('cost_function, output_function', [
+    (ai.SquareCostFunc(), ai.SigmoidFunc()),
+    (ai.CrossEntropyCostFunc(), ai.SoftmaxFunc()),
+])
+def test_batched_gradient_matches_per_sample_reference(cost_function, output_function):
+    rng = np.random.default_rng(3)
+    model = _create_ai(False)
+    model.f = (ai.ReLuFunc(), output_function)
+    model.cost_function = cost_function
+    x, y = rng.random((7, 20)), np.eye(3)[rng.integers(0, 3, 7)]
+
+    plan = model.compute_gradient(x, y)
+    w_gradient, b_gradient = _reference_gradient(model, x, y)
+    for actual, expected in zip((*plan.w_gradient, *plan.b_gradient), (*w_gradient, *b_gradient)):
+        np.testing.assert_allclose(actual, expected, rtol=1e-10, atol=1e-14)
+
+
+def test_batched_gradient_matches_finite_differences():
+    rng = np.random.default_rng(4)
+    model = _create_ai(False)
+    x, y = rng.random((4, 20)), np.eye(3)[rng.integers(0, 3, 4)]
+    gradient = np.copy(model.compute_gradient(x, y).gradient)
+
+    # The mean over samples of the summed per output costs, which the gradient is of
+    def cost() -> float:
+        _, activations = model._feed(x)
+        return np.mean(np.sum(model.cost_function.costs_of(activations[-1], y), axis=1))
+
+    eps = 1e-6
+    for i in rng.choice(model.layout.size, 20, replace=False):
+        model.params[i] += eps
+        upper = cost()
+        model.params[i] -= 2 * eps
+        lower = cost()
+        model.params[i] += eps
+        assert (upper - lower) / (2 * eps) == pytest.approx(gradient[i], rel=1e-5, abs=1e-9)
+
+
+def test_train_in_parts_matches_whole_batch():
+    rng = np.random.default_rng(5)
+    model = _create_ai(False)
+    x, y = rng.random((6, 20)), np.eye(3)[rng.integers(0, 3, 6)]
+    whole = np.copy(model.compute_gradient(x, y).gradient)
+    parts = sum(np.copy(model.compute_gradient(x[i:i + 2], y[i:i + 2], batch_size=6).gradient)
+                for i in range(0, 6, 2))
+    np.testing.assert_allclose(parts, whole, rtol=1e-12, atol=1e-15)
+
+
+# Samples with 3 of 20 columns ever nonzero, sparse enough for Auto
+def _sparse_batch() -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(1)
+    x = np.zeros((5, 20))
+    x[:, [2, 7, 11]] = rng.random((5, 3))
+    return x, np.eye(3)[rng.integers(0, 3, 5)]
+
+
+@pytest.mark.parametrize('sparse_input', [True, None])
+def test_sparse_input_gradient_matches_dense(sparse_input):
+    x, y = _sparse_batch()
+    sparse, dense = _create_ai(sparse_input), _create_ai(False)
+
+    sparse_plan = sparse.compute_gradient(x, y)
+    np.testing.assert_array_equal(sparse_plan.x_columns, [2, 7, 11])
+    dense_plan = dense.compute_gradient(x, y)
+    assert dense_plan.x_columns is None
+    np.testing.assert_allclose(sparse_plan.gradient, dense_plan.gradient, rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(sparse_plan.costs, dense_plan.costs)
+
+
+def test_sparse_input_auto_stays_dense_for_dense_batch():
+    rng = np.random.default_rng(2)
+    model = _create_ai(None)
+    plan = model.compute_gradient(rng.random((5, 20)), np.eye(3)[rng.integers(0, 3, 5)])
+    assert plan.x_columns is None
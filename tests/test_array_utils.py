@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from utils.array_utils import GrowableArray, MinMaxPyramid, SumPyramid, get_range_sum
+
+
+def test_growable_array_appends_and_extends_past_capacity():
+    array = GrowableArray((2,), np.int64, capacity=1)
+    rows = np.arange(40).reshape(20, 2)
+    array.append(rows[0])
+    array.extend(rows[1:5])
+    for row in rows[5:]:
+        array.append(row)
+    assert len(array) == 20
+    np.testing.assert_array_equal(array.array, rows)
+
+
+def test_growable_array_rejects_empty_capacity():
+    with pytest.raises(ValueError):
+        GrowableArray((), np.float64, capacity=0)
+
+
+def _ranges(size: int):
+    rng = np.random.default_rng(size)
+    ends = [(0, size), (0, 0), (size, size), (size // 2, size)]
+    return ends + [tuple(sorted(rng.integers(0, size + 1, 2))) for _ in range(60)]
+
+
+@pytest.mark.parametrize('block_size', [1, 2, 4, 16])
+@pytest.mark.parametrize('size', [1, 15, 64, 77])
+def test_sum_pyramid_range_sums_match_brute_force(block_size, size):
+    rng = np.random.default_rng(0)
+    rows = rng.random((size, 6))
+    pyramid = SumPyramid((6,), np.float64, block_size)
+    for row in rows:
+        pyramid.append(row)
+    assert len(pyramid) == size
+    for left, right in _ranges(size):
+        np.testing.assert_allclose(pyramid.sum(rows, left, right), rows[left:right].sum(axis=0), atol=1e-12)
+        np.testing.assert_allclose(pyramid.sum(rows, left, right, slice(2, 5)), rows[left:right, 2:5].sum(axis=0),
+                                   atol=1e-12)
+
+
+def test_sum_pyramid_rejects_ranges_out_of_rows():
+    pyramid = SumPyramid((), np.float64, 2)
+    rows = np.arange(5.)
+    for row in rows:
+        pyramid.append(row)
+    for left, right in ((-1, 2), (3, 2), (0, 6)):
+        with pytest.raises(IndexError):
+            pyramid.sum(rows, left, right)
+
+
+# Levels written elsewhere, e.g. to log columns, are read back by get_range_sum
+def test_get_range_sum_over_levels_of_new_level():
+    rng = np.random.default_rng(1)
+    rows = rng.integers(0, 100, (50, 3))
+    levels = []
+
+    def new_level(k):
+        assert k == len(levels)
+        levels.append([])
+        return levels[-1]
+
+    pyramid = SumPyramid((3,), np.int64, 4, new_level)
+    for row in rows:
+        pyramid.append(row)
+    assert [len(level) for level in levels] == [12, 6, 3, 1]
+    arrays = [np.array(level) for level in levels]
+    for left, right in _ranges(50):
+        np.testing.assert_array_equal(get_range_sum(rows, arrays, 4, left, right), rows[left:right].sum(axis=0))
+
+
+@pytest.mark.parametrize('size', [1, 2, 33, 1000])
+@pytest.mark.parametrize('max_points', [10, 64, 500])
+def test_min_max_pyramid_decimation_keeps_ends_and_extremes(size, max_points):
+    rng = np.random.default_rng(size)
+    values = np.cumsum(rng.normal(size=size))
+    pyramid = MinMaxPyramid()
+    for value in values:
+        pyramid.append(value)
+    np.testing.assert_array_equal(pyramid.values, values)
+    for left, right in _ranges(size):
+        indices = pyramid.decimate(left, right, max_points)
+        if right - left <= max_points:
+            np.testing.assert_array_equal(indices, np.arange(left, right))
+            continue
+        assert np.all(np.diff(indices) > 0)
+        assert indices[0] == left and indices[-1] == right - 1
+        assert len(indices) <= max_points
+        selected = values[indices]
+        assert selected.min() == values[left:right].min() and selected.max() == values[left:right].max()
+
+
+# Every block keeps its min and max, so kept indices are less than two blocks apart. 3900 values reduced to
+# 200 points take blocks of 64
+def test_min_max_pyramid_decimation_keeps_extremes_of_every_block():
+    rng = np.random.default_rng(7)
+    values = rng.normal(size=4096)
+    pyramid = MinMaxPyramid()
+    for value in values:
+        pyramid.append(value)
+    indices = pyramid.decimate(100, 4000, 200)
+    gaps = np.diff(indices)
+    assert gaps.max() <= 2 * 64
+    assert len(indices) >= 100
+
+
+def test_min_max_pyramid_rejects_ranges_out_of_values():
+    pyramid = MinMaxPyramid()
+    pyramid.append(1.)
+    with pytest.raises(IndexError):
+        pyramid.decimate(0, 2, 10)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('PyQt5')
+pytest.importorskip('pyqtgraph')
+
+import ai
+from ui.plot.gradient import GradientHub
+from ui.plot.gradient_params import Aggregation, Component, Mode
+
+
+def _metrics(count: int) -> list[ai.TrainMetric]:
+    rng = np.random.default_rng(0)
+    layout = ai.ParamLayout([(3, 4), (2, 3)], [(3,), (2,)])
+    return [ai.TrainMetric(data_used=30 * (i + 1), gradient_len=1., cost=1., layout=layout,
+                           params=rng.random(layout.size), gradient=rng.random(layout.size))
+            for i in range(count)]
+
+
+def test_get_info_clamps_region_past_received_steps():
+    hub = GradientHub(layer_count=2)
+    hub.update_data(_metrics(4))
+
+    info, layer_stats, stats = hub.get_info(1, 10, 0, Component.WEIGHTS, Mode.STATE, Aggregation.NONE)
+    expected, expected_layer_stats, expected_stats = hub.get_info(1, 4, 0, Component.WEIGHTS, Mode.STATE,
+                                                                  Aggregation.NONE)
+    assert info.shape == (3, 3, 4)
+    np.testing.assert_array_equal(info, expected)
+    np.testing.assert_allclose(layer_stats, expected_layer_stats)
+    np.testing.assert_allclose(stats, expected_stats)
+    np.testing.assert_array_equal(hub.get_x_vals(1, 10), [60, 90, 120])
+
+
+def test_get_info_of_region_without_received_steps():
+    hub = GradientHub(layer_count=2)
+    hub.update_data(_metrics(2))
+
+    info, layer_stats, stats = hub.get_info(5, 10, 1, Component.BIASES, Mode.GRADIENT, Aggregation.MEAN)
+    assert info is None
+    assert layer_stats[0] == 0 and stats[0] == 0
+    assert len(hub.get_x_vals(5, 10)) == 0
@@ -0,0 +1,80 @@
+import itertools
+import pickle
+
+import numpy as np
+import pytest
+
+from utils.iter_utils import EpochSampler
+
+
+def test_epoch_sampler_covers_every_sample_once_per_epoch():
+    sampler = EpochSampler(12, 4, count=9, seed=0)
+    batches = list(sampler)
+    assert len(batches) == len(sampler) == 9
+    assert all(len(b) == 4 and b.dtype == np.int32 for b in batches)
+    epochs = np.concatenate(batches).reshape(3, 12)
+    for epoch in epochs:
+        np.testing.assert_array_equal(np.sort(epoch), np.arange(12))
+    assert not np.array_equal(epochs[0], epochs[1])
+
+
+def test_epoch_sampler_batches_continue_across_epochs():
+    batches = list(EpochSampler(10, 4, count=5, seed=1))
+    indices = np.concatenate(batches)
+    for epoch in indices.reshape(2, 10):
+        np.testing.assert_array_equal(np.sort(epoch), np.arange(10))
+
+
+def test_epoch_sampler_is_deterministic_by_seed():
+    first, second = EpochSampler(50, 7, count=20, seed=3), EpochSampler(50, 7, count=20, seed=3)
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+    # Every iteration yields the same batches
+    for a, b in zip(first, first):
+        np.testing.assert_array_equal(a, b)
+    other = np.concatenate(list(EpochSampler(50, 7, count=20, seed=4)))
+    assert not np.array_equal(np.concatenate(list(first)), other)
+
+
+def test_epoch_sampler_draws_a_seed_without_one():
+    sampler = EpochSampler(10, 2, count=3)
+    assert isinstance(sampler.seed, int)
+    restored = pickle.loads(pickle.dumps(sampler))
+    for a, b in zip(sampler, restored):
+        np.testing.assert_array_equal(a, b)
+
+
+@pytest.mark.parametrize('count', [10, 11, 3])
+def test_epoch_sampler_shards_interleave_to_whole(count):
+    sampler = EpochSampler(20, 3, count=count, seed=5)
+    workers = 3
+    shards = [sampler.shard(rank, workers) for rank in range(workers)]
+    assert sum(len(s) for s in shards) == count
+    iterators = [iter(s) for s in shards]
+    for step, batch in enumerate(sampler):
+        np.testing.assert_array_equal(next(iterators[step % workers]), batch)
+    for it in iterators:
+        assert next(it, None) is None
+
+
+def test_epoch_sampler_endless():
+    sampler = EpochSampler(5, 2, seed=6)
+    with pytest.raises(TypeError):
+        len(sampler)
+    batches = list(itertools.islice(sampler, 100))
+    assert len(batches) == 100
+    np.testing.assert_array_equal(np.bincount(np.concatenate(batches)), np.full(5, 40))
+    shard = list(itertools.islice(sampler.shard(1, 2), 50))
+    for a, b in zip(shard, batches[1::2]):
+        np.testing.assert_array_equal(a, b)
+
+
+@pytest.mark.parametrize('args', [(0, 1), (5, 0), (5, 1, -1)])
+def test_epoch_sampler_rejects_invalid_sizes(args):
+    with pytest.raises(ValueError):
+        EpochSampler(*args)
+
+
+def test_epoch_sampler_rejects_invalid_rank():
+    with pytest.raises(ValueError):
+        EpochSampler(5, 1).shard(2, 2)
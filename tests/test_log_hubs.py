@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('PyQt5')
+pytest.importorskip('pyqtgraph')
+
+import ai
+from metric_log import MetricLog, MetricLogWriter
+from ui.plot.correlation import CorrelationHub
+from ui.plot.distribution import DistributionHub
+from ui.plot.grad_len import GradLenHub
+from ui.plot.recent_cost import RecentCostHub
+
+CHUNK_SIZE = 4
+
+
+# Metrics with expected outputs, with sample indices instead, with both and with scalars only
+def _metrics(train_y: np.ndarray) -> list[ai.TrainMetric]:
+    rng = np.random.default_rng(0)
+    metrics = []
+    for i, kind in enumerate(('expected', 'indices', None, 'both', 'expected', 'indices')):
+        rows = (3, 4, 2)[i % 3]
+        fields = {}
+        if kind is not None:
+            fields['outputs'] = rng.random((rows, 10))
+        if kind in ('expected', 'both'):
+            fields['expected'] = np.eye(10)[rng.integers(0, 10, rows)]
+        if kind in ('indices', 'both'):
+            fields['indices'] = rng.integers(0, len(train_y), rows).astype(np.int32)
+        metrics.append(ai.TrainMetric(data_used=30 * (i + 1), gradient_len=rng.random(), cost=rng.random(),
+                                      **fields))
+    return metrics
+
+
+@pytest.fixture
+def hubs(tmp_path):
+    train_y = np.eye(10)[np.random.default_rng(1).integers(0, 10, 50)]
+    metrics = _metrics(train_y)
+    writer = MetricLogWriter(str(tmp_path / 'run'), ai.ParamLayout([(10, 6)], [(10,)]), CHUNK_SIZE, np.float64,
+                             segment_size=4)
+    for m in metrics:
+        writer.put(m)
+    writer.flush()
+    log = MetricLog(writer.path)
+    pairs = [(CorrelationHub(train_y), CorrelationHub(train_y, log)), (DistributionHub(), DistributionHub(log)),
+             (GradLenHub(), GradLenHub(log)), (RecentCostHub(), RecentCostHub(log))]
+    # The log holds more metrics than the hubs received
+    for memory_hub, log_hub in pairs:
+        memory_hub.update_data(metrics[:5])
+        log_hub.update_data(metrics[:5])
+    return pairs
+
+
+@pytest.mark.parametrize('left, right', [(0, 5), (1, 4), (3, 4), (4, 9)])
+def test_log_hubs_match_memory_hubs(hubs, left, right):
+    (correlation, log_correlation), (distribution, log_distribution), (grad_len, log_grad_len), _ = hubs
+    for expected, actual in zip(correlation.calc(left, min(right, 5)), log_correlation.calc(left, right)):
+        np.testing.assert_allclose(actual, expected)
+    np.testing.assert_allclose(log_distribution.calc(left, right, 10), distribution.calc(left, min(right, 5), 10))
+    np.testing.assert_allclose(log_grad_len.calc(left, right), grad_len.calc(left, min(right, 5)))
+
+
+def test_log_recent_cost_hub_matches_memory_hub(hubs):
+    recent_cost, log_recent_cost = hubs[3]
+    for max_range in (2, 20):
+        for expected, actual in zip(recent_cost.calc(max_range), log_recent_cost.calc(max_range)):
+            np.testing.assert_allclose(actual, expected)
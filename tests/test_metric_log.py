@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+import ai
+from metric_log import SUM_BLOCK_SIZE, MetricLog, MetricLogQueue, MetricLogWriter
+from metrics import ARRAY_FIELDS, MetricReducer
+from resources.app_ini import MetricDetail
+from utils.array_utils import get_range_sum
+
+CHUNK_SIZE = 4
+DETAILS = (MetricDetail.FULL, MetricDetail.SUMMARY, MetricDetail.SCALARS)
+
+
+# Metrics of a few train steps at every detail level in turn, some with sample indices, the last chunk partial
+def _metrics(count: int) -> tuple[ai.ParamLayout, list[ai.TrainMetric]]:
+    rng = np.random.default_rng(0)
+    weights = (rng.normal(size=(5, 6)), rng.normal(size=(3, 5)))
+    biases = (rng.normal(size=5), rng.normal(size=3))
+    model = ai.Ai(weights, biases, learning_rate=0.1)
+    metrics = []
+    for step in range(count):
+        rows = CHUNK_SIZE if step < count - 1 else CHUNK_SIZE - 1
+        x, y = rng.random((rows, 6)), np.eye(3)[rng.integers(0, 3, rows)]
+        indices = rng.integers(0, 100, rows) if step % 2 else None
+        reducer = MetricReducer(DETAILS[step % len(DETAILS)])
+        metrics.append(reducer.reduce(model.train(x, y), indices))
+    return model.layout, metrics
+
+
+@pytest.fixture
+def written(tmp_path):
+    # Every third metric is full, so params and gradients fill two sum blocks and a part
+    layout, metrics = _metrics(6 * SUM_BLOCK_SIZE + 5)
+    writer = MetricLogWriter(str(tmp_path / 'run'), layout, CHUNK_SIZE, np.float64, segment_size=4,
+                             flush_interval=7)
+    return writer, metrics
+
+
+def _assert_metrics_equal(actual: ai.TrainMetric, expected: ai.TrainMetric):
+    assert (actual.data_used, actual.gradient_len, actual.cost) == \
+           (expected.data_used, expected.gradient_len, expected.cost)
+    for name, _ in ARRAY_FIELDS:
+        value = getattr(expected, name)
+        if value is None:
+            assert getattr(actual, name) is None, name
+        else:
+            np.testing.assert_array_equal(getattr(actual, name), value, err_msg=name)
+    assert (actual.layout is None) == (expected.layout is None)
+
+
+def test_metric_log_round_trip(written):
+    writer, metrics = written
+    for m in metrics:
+        writer.put(m)
+    writer.put(None)
+
+    log = MetricLog(writer.path)
+    assert log.closed and len(log) == len(metrics)
+    assert log.layout.shapes == metrics[0].layout.shapes
+    for step, m in enumerate(metrics):
+        _assert_metrics_equal(log.metric(step), m)
+    full_steps = [step for step, m in enumerate(metrics) if m.params is not None]
+    np.testing.assert_array_equal(log.steps('params'), full_steps)
+    assert log.find('params', 1) is None
+    w, b = log.find_views('params', 0)
+    np.testing.assert_array_equal(w[1], metrics[0].w[1])
+
+
+def test_metric_log_reader_refreshes_while_written(written):
+    writer, metrics = written
+    for m in metrics[:10]:
+        writer.put(m)
+    log = MetricLog(writer.path)
+    # Flushed every 7 metrics
+    assert len(log) == 7 and not log.closed
+    for m in metrics[10:]:
+        writer.put(m)
+    writer.flush()
+    log.refresh()
+    assert len(log) == len(metrics)
+    _assert_metrics_equal(log.metric(len(metrics) - 1), metrics[-1])
+
+
+def test_metric_log_range_sums_from_sum_columns(written):
+    writer, metrics = written
+    for m in metrics:
+        writer.put(m)
+    writer.close()
+
+    log = MetricLog(writer.path)
+    assert log.sum_block_size == SUM_BLOCK_SIZE
+    for name in ('params', 'gradient'):
+        rows = log.column(name)
+        kept = np.array([getattr(m, name) for m in metrics if getattr(m, name) is not None])
+        levels = log.sum_levels(name)
+        assert [len(level) for level in levels] == [2, 1]
+        for left, right in ((0, len(kept)), (1, len(kept) - 1), (3, 4), (5, 5), (16, 32)):
+            np.testing.assert_allclose(get_range_sum(rows, levels, SUM_BLOCK_SIZE, left, right, slice(2, 9)),
+                                       kept[left:right, 2:9].sum(axis=0))
+
+
+def test_metric_log_sample_rows_drop_padding(written):
+    writer, metrics = written
+    for m in metrics:
+        writer.put(m)
+    writer.close()
+
+    log = MetricLog(writer.path)
+    outputs, steps = log.sample_rows('outputs', 2, len(metrics))
+    expected_steps = [step for step, m in enumerate(metrics[2:], 2) if m.outputs is not None]
+    np.testing.assert_array_equal(outputs, np.concatenate([metrics[step].outputs for step in expected_steps]))
+    np.testing.assert_array_equal(steps, np.repeat(expected_steps, [len(metrics[s].outputs) for s in expected_steps]))
+    outputs, steps = log.sample_rows('outputs', 2, 3)
+    assert outputs.shape == (0, 3) and len(steps) == 0
+
+
+def test_metric_log_queue_replays_in_batches(written):
+    writer, metrics = written
+    for m in metrics:
+        writer.put(m)
+    writer.close()
+
+    queue = MetricLogQueue(MetricLog(writer.path), batch_size=10)
+    replayed = []
+    while (batch := queue.get()) is not None:
+        assert len(batch) <= 10
+        replayed.extend(batch)
+    assert len(replayed) == len(metrics)
+    for actual, expected in zip(replayed, metrics):
+        _assert_metrics_equal(actual, expected)
+
+
+def test_closed_metric_log_rejects_metrics(written):
+    writer, metrics = written
+    writer.close()
+    with pytest.raises(ValueError):
+        writer.put(metrics[0])
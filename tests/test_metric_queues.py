@@ -0,0 +1,159 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import ai
+import buffered_queue
+from buffered_queue import BufferedQueue
+from resources.app_ini import BackpressurePolicy
+from shared_queue import SharedMetricQueue
+
+LAYOUT = ai.ParamLayout([(3, 4)], [(3,)])
+CHUNK_SIZE = 2
+
+
+def _metric(step: int) -> ai.TrainMetric:
+    return ai.TrainMetric(data_used=step, gradient_len=1., cost=float(step), layout=LAYOUT,
+                          params=np.full(LAYOUT.size, step, dtype=np.float64),
+                          outputs=np.full((CHUNK_SIZE, 3), step, dtype=np.float64))
+
+
+def _buffered(policy, max_size=1, batch_size=3, **kwargs) -> BufferedQueue:
+    return BufferedQueue(max_size=max_size, batch_size=batch_size, policy=policy, **kwargs)
+
+
+def _shared(policy, capacity=4, batch_size=3) -> SharedMetricQueue:
+    return SharedMetricQueue(LAYOUT, CHUNK_SIZE, np.float64, capacity=capacity, batch_size=batch_size, policy=policy)
+
+
+# Gets batches until the end in a thread, copying metrics, as shared queue metrics are views of its slots
+class _Consumer(threading.Thread):
+    def __init__(self, q, delay=0.) -> None:
+        super().__init__(daemon=True)
+        self._queue = q
+        self._delay = delay
+        self.batches = []
+
+    def run(self):
+        while (batch := self._queue.get(timeout=10)) is not None:
+            self.batches.append([(m.data_used, None if m.params is None else float(m.params[0])) for m in batch])
+            time.sleep(self._delay)
+
+    @property
+    def metrics(self) -> list[tuple[int, float | None]]:
+        return [m for batch in self.batches for m in batch]
+
+
+def _run(q, steps: int, delay=0., start_consumer_first=True) -> _Consumer:
+    consumer = _Consumer(q, delay)
+    if start_consumer_first:
+        consumer.start()
+    for step in range(1, steps + 1):
+        q.put(_metric(step))
+    if not start_consumer_first:
+        consumer.start()
+    q.put(None)
+    consumer.join(10)
+    assert not consumer.is_alive()
+    q.close()
+    return consumer
+
+
+@pytest.mark.parametrize('make_queue', [_buffered, _shared], ids=['buffered', 'shared'])
+def test_block_delivers_every_metric_in_order(make_queue):
+    consumer = _run(make_queue(BackpressurePolicy.BLOCK), 50, delay=0.001)
+    assert consumer.metrics == [(step, step) for step in range(1, 51)]
+    assert all(len(batch) <= 3 for batch in consumer.batches)
+
+
+def test_buffered_queue_sends_full_batches_and_the_incomplete_last_one():
+    consumer = _run(_buffered(BackpressurePolicy.BLOCK, max_size=10), 8)
+    assert [len(batch) for batch in consumer.batches] == [3, 3, 2]
+
+
+def test_buffered_queue_without_incomplete_batches_drops_the_rest():
+    consumer = _run(_buffered(BackpressurePolicy.BLOCK, max_size=10, send_incomplete=False), 8)
+    assert [len(batch) for batch in consumer.batches] == [3, 3]
+
+
+@pytest.mark.parametrize('make_queue', [_buffered, _shared], ids=['buffered', 'shared'])
+def test_drop_oldest_keeps_the_newest_metrics(make_queue):
+    consumer = _run(make_queue(BackpressurePolicy.DROP_OLDEST), 100, start_consumer_first=False)
+    steps = [step for step, _ in consumer.metrics]
+    assert steps == sorted(steps) and steps[-1] == 100
+    # What the transport holds, then the newest batch size pending metrics
+    assert len(steps) <= 4 + 3
+    assert all(params == step for step, params in consumer.metrics)
+
+
+@pytest.mark.parametrize('make_queue', [_buffered, _shared], ids=['buffered', 'shared'])
+def test_coalesce_keeps_every_scalar_and_the_newest_arrays(make_queue):
+    consumer = _run(make_queue(BackpressurePolicy.COALESCE), 100, start_consumer_first=False)
+    steps = [step for step, _ in consumer.metrics]
+    assert steps == list(range(1, 101))
+    # Arrays of metrics pending behind a full transport are dropped, but for the newest one
+    assert consumer.metrics[-1] == (100, 100)
+    assert sum(params is None for _, params in consumer.metrics) >= 90
+
+
+def test_coalesce_thins_a_backlog_past_its_bound(monkeypatch):
+    monkeypatch.setattr(buffered_queue, 'COALESCE_MAX_PENDING', 16)
+    consumer = _run(_buffered(BackpressurePolicy.COALESCE), 500, start_consumer_first=False)
+    steps = [step for step, _ in consumer.metrics]
+    assert steps == sorted(steps) and steps[-1] == 500
+    assert len(steps) <= 3 + 16 + 1
+    # Thinned evenly, so the kept steps still span the backlog
+    gaps = np.diff(steps[3:-2])
+    assert len(set(gaps)) == 1 and steps[3] < gaps[0] + 4
+
+
+def test_flush_interval_sends_an_incomplete_batch_while_the_producer_is_busy():
+    q = _buffered(BackpressurePolicy.BLOCK, max_size=10, batch_size=100, flush_interval=0.05)
+    q.put(_metric(1))
+    q.put(_metric(2))
+    batch = q.get(timeout=2)
+    assert [m.data_used for m in batch] == [1, 2]
+    q.put(_metric(3))
+    assert [m.data_used for m in q.get(timeout=2)] == [3]
+    q.put(None)
+    assert q.get(timeout=2) is None
+    q.close()
+
+
+def test_flush_sends_the_pending_batch():
+    q = _buffered(BackpressurePolicy.BLOCK, max_size=10, batch_size=100)
+    q.put(_metric(1))
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.05)
+    q.flush()
+    assert [m.data_used for m in q.get(timeout=2)] == [1]
+    q.close()
+
+
+def _produce(q: SharedMetricQueue, steps: int):
+    for step in range(1, steps + 1):
+        q.put(_metric(step))
+    q.put(None)
+
+
+def test_shared_metric_queue_from_another_process():
+    q = _shared(BackpressurePolicy.BLOCK, capacity=5, batch_size=2)
+    process = mp.Process(target=_produce, args=(q, 40))
+    process.start()
+    received = []
+    while (batch := q.get(timeout=10)) is not None:
+        for m in batch:
+            np.testing.assert_array_equal(m.outputs, np.full((CHUNK_SIZE, 3), m.data_used))
+            received.append((m.data_used, m.cost, float(m.params[-1])))
+    process.join(10)
+    q.close()
+    assert received == [(step, step, step) for step in range(1, 41)]
+
+
+def test_shared_metric_queue_rejects_capacity_of_a_batch():
+    with pytest.raises(ValueError):
+        _shared(BackpressurePolicy.BLOCK, capacity=3, batch_size=3)
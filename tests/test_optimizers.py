@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from optimizers import AdamOptimizer, MomentumOptimizer, NesterovOptimizer, RmsPropOptimizer, SgdOptimizer
+
+LEARNING_RATE = 0.1
+STEPS = 4
+
+
+def _sgd():
+    def step(p, g, _):
+        return p - LEARNING_RATE * g
+    return step
+
+
+def _momentum(mu, nesterov=False):
+    def step(p, g, state):
+        state['v'] = mu * state.get('v', 0) + g
+        return p - LEARNING_RATE * (g + mu * state['v'] if nesterov else state['v'])
+    return step
+
+
+def _rms_prop(rho, eps):
+    def step(p, g, state):
+        state['s'] = rho * state.get('s', 0) + (1 - rho) * g ** 2
+        return p - LEARNING_RATE * g / (np.sqrt(state['s']) + eps)
+    return step
+
+
+def _adam(beta1, beta2, eps):
+    def step(p, g, state):
+        t = state['t'] = state.get('t', 0) + 1
+        state['m'] = beta1 * state.get('m', 0) + (1 - beta1) * g
+        state['v'] = beta2 * state.get('v', 0) + (1 - beta2) * g ** 2
+        lr_t = LEARNING_RATE * np.sqrt(1 - beta2 ** t) / (1 - beta1 ** t)
+        return p - lr_t * state['m'] / (np.sqrt(state['v']) + eps)
+    return step
+
+
+@pytest.mark.parametrize('optimizer, reference_step', [
+    (SgdOptimizer(), _sgd()),
+    (MomentumOptimizer(0.8), _momentum(0.8)),
+    (NesterovOptimizer(0.8), _momentum(0.8, nesterov=True)),
+    (RmsPropOptimizer(0.9, 1e-8), _rms_prop(0.9, 1e-8)),
+    (AdamOptimizer(0.9, 0.999, 1e-8), _adam(0.9, 0.999, 1e-8)),
+], ids=['sgd', 'momentum', 'nesterov', 'rms_prop', 'adam'])
+def test_optimizer_steps_match_update_rule(optimizer, reference_step):
+    rng = np.random.default_rng(0)
+    params = [rng.normal(size=(3, 4)), rng.normal(size=5)]
+    expected = [np.copy(p) for p in params]
+    # State is kept per parameter array
+    states = [{} for _ in params]
+    for _ in range(STEPS):
+        gradients = [rng.normal(size=p.shape) for p in params]
+        optimizer.step(params, gradients, LEARNING_RATE)
+        expected = [reference_step(p, g, state) for p, g, state in zip(expected, gradients, states)]
+        for actual, reference in zip(params, expected):
+            np.testing.assert_allclose(actual, reference, rtol=1e-12)
+
+
+def test_optimizer_updates_in_place_and_keeps_dtype():
+    params = [np.ones(4, dtype=np.float32)]
+    view = params[0]
+    AdamOptimizer().step(params, [np.full(4, 0.5, dtype=np.float32)], np.float32(0.01))
+    assert params[0] is view and view.dtype == np.float32
+    assert np.all(view < 1)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('PyQt5')
+
+import ai
+from ui.version_hub import Approx, VersionHub
+
+
+def _hub(data_used: list[int]) -> VersionHub:
+    hub = VersionHub()
+    hub.update_data([ai.TrainMetric(data_used=du, gradient_len=0., cost=0.) for du in data_used])
+    return hub
+
+
+@pytest.mark.parametrize('approx', [Approx.LE, Approx.GE])
+def test_empty_hub_has_no_versions(approx):
+    hub = VersionHub()
+    assert hub.get_version(10, approx) is None
+    np.testing.assert_array_equal(hub.get_versions(np.array([0, 10]), approx), [-1, -1])
+    with pytest.raises(ValueError):
+        hub.get_version(10)
+
+
+def test_exact_lookup():
+    hub = _hub([10, 20, 20, 30])
+    assert hub.get_version(10) == 0
+    assert hub.get_version(20, Approx.EQ) == 1
+    with pytest.raises(ValueError):
+        hub.get_version(25)
+    np.testing.assert_array_equal(hub.get_versions(np.array([30, 15, 20])), [3, -1, 1])
+
+
+def test_less_or_equal_lookup_finds_first_of_equal_versions():
+    hub = _hub([10, 20, 20, 30])
+    assert hub.get_version(5, Approx.LE) is None
+    assert [hub.get_version(du, Approx.LE) for du in (10, 19, 20, 25, 30, 99)] == [0, 0, 1, 1, 3, 3]
+    np.testing.assert_array_equal(hub.get_versions(np.array([5, 25, 99]), Approx.LE), [-1, 1, 3])
+
+
+def test_greater_or_equal_lookup_finds_first_of_equal_versions():
+    hub = _hub([10, 20, 20, 30])
+    assert hub.get_version(31, Approx.GE) is None
+    assert [hub.get_version(du, Approx.GE) for du in (0, 10, 11, 20, 21, 30)] == [0, 0, 1, 1, 3, 3]
+    np.testing.assert_array_equal(hub.get_versions(np.array([31, 15, 0]), Approx.GE), [-1, 1, 0])
+
+
+def test_lookup_rejects_invalid_approx():
+    with pytest.raises(ValueError):
+        _hub([10]).get_version(10, 'LE')
@@ -1,4 +1,6 @@
 import multiprocessing as mp
+import os
+import time
 from typing import Iterable
 
 import numpy as np
@@ -6,33 +8,83 @@ from PyQt5.QtWidgets import QApplication
 
 import ai
 from buffered_queue import BufferedQueue
+from metric_log import MetricLog, MetricLogQueue, MetricLogWriter
+from metrics import MetricReducer
+from resources.app_ini import ParallelMode, MetricDetail, MetricTransport, BackpressurePolicy
+from shared_queue import SharedMetricQueue
+from training import train, create_control
 from ui.main_window import MainWindow
-
-
-def train(queue, train_data, ai_model):
-    for xy_chunk in train_data:
-        xs, ys = zip(*xy_chunk)
-        xy_chunk.clear()
-        metric = ai_model.train(xs, ys)
-        queue.put_nowait(metric)
-    queue.put_nowait(None)
+from utils.iter_utils import EpochSampler
 
 
 class AiTrainer(QApplication):
     def __init__(self,
                  ai_model: ai.Ai,
-                 train_data: Iterable[list[tuple[np.ndarray, np.ndarray]]],
+                 train_set: tuple[np.ndarray, np.ndarray],
+                 sampler: EpochSampler,
                  test_data: Iterable[tuple[np.ndarray, np.ndarray]],
                  queue_max_size=3,
-                 queue_batch_size=5
+                 queue_batch_size=5,
+                 queue_flush_interval=0.,
+                 train_workers=1,
+                 parallel_mode=ParallelMode.SYNC,
+                 metric_transport=MetricTransport.QUEUE,
+                 backpressure_policy=BackpressurePolicy.BLOCK,
+                 metric_detail=MetricDetail.FULL,
+                 full_metric_interval=0,
+                 metric_log_dir=''
                  ) -> None:
         super().__init__([])
 
-        queue = BufferedQueue(max_size=queue_max_size, batch_size=queue_batch_size)
-        self._window = MainWindow(queue, test_data, ai_model)
-        self._train_process = mp.Process(target=train, args=(queue, train_data, ai_model), daemon=True)
+        chunk_size = sampler.batch_size
+        self._log_writer = None
+        if metric_log_dir:
+            path = os.path.join(metric_log_dir, time.strftime('run-%Y%m%d-%H%M%S'))
+            self._log_writer = MetricLogWriter(path, ai_model.layout, chunk_size, ai_model.dtype)
+        if metric_transport is MetricTransport.SHARED_MEMORY:
+            queue = SharedMetricQueue(ai_model.layout, chunk_size, ai_model.dtype,
+                                      capacity=queue_max_size * queue_batch_size, batch_size=queue_batch_size,
+                                      policy=backpressure_policy)
+        else:
+            queue = BufferedQueue(max_size=queue_max_size, batch_size=queue_batch_size, policy=backpressure_policy,
+                                  flush_interval=queue_flush_interval)
+        self._queue = queue
+        control = create_control(train_workers, parallel_mode)
+        self._window = MainWindow(queue, train_set, test_data, ai_model, log_writer=self._log_writer, control=control)
+        reducer = MetricReducer(metric_detail, full_metric_interval)
+        # Not a daemon, as daemon processes can't start the data parallel workers. Terminated on exit instead
+        self._train_process = mp.Process(target=train, args=(queue, train_set, sampler, ai_model, train_workers,
+                                                             parallel_mode, reducer, control))
 
     def exec(self) -> int:
         self._train_process.start()
+        self._window.show()
+        code = super().exec()
+        if self._train_process.is_alive():
+            self._train_process.terminate()
+        self._train_process.join()
+        self._queue.close()
+        if self._log_writer is not None:
+            self._log_writer.close()
+        return code
+
+
+# Shows a run recorded in a metric log instead of training
+class RunViewer(QApplication):
+    def __init__(self,
+                 ai_model: ai.Ai,
+                 train_set: tuple[np.ndarray, np.ndarray],
+                 test_data: Iterable[tuple[np.ndarray, np.ndarray]],
+                 metric_log: MetricLog,
+                 queue_batch_size=1000
+                 ) -> None:
+        super().__init__([])
+        if metric_log.layout.shapes != ai_model.layout.shapes:
+            raise ValueError(f'Metric log {metric_log.path} was recorded by a model with layers of shapes '
+                             f'{metric_log.layout.shapes}. Got: {ai_model.layout.shapes}')
+        queue = MetricLogQueue(metric_log, queue_batch_size)
+        self._window = MainWindow(queue, train_set, test_data, ai_model, metric_log=metric_log)
+
+    def exec(self) -> int:
         self._window.show()
         return super().exec()
@@ -0,0 +1,44 @@
+import signal
+import sys
+
+import numpy as np
+
+from control import TrainControl
+from data_set import BatchLoader
+from metrics import MetricReducer
+from parallel import DataParallelTrainer, train_hogwild
+from resources.app_ini import ParallelMode
+from utils.iter_utils import EpochSampler
+
+
+# Control for train: Hogwild workers poll it each, other modes in the calling process only
+def create_control(workers=1, parallel_mode=ParallelMode.SYNC) -> TrainControl:
+    return TrainControl(consumers=workers if parallel_mode is ParallelMode.HOGWILD else 1)
+
+
+# train_set holds the x and y arrays, sampler the sample indices of every train step.
+# The control, if any, is polled before every step
+def train(queue, train_set: tuple[np.ndarray, np.ndarray], sampler: EpochSampler, ai_model, workers=1,
+          parallel_mode=ParallelMode.SYNC, reducer: MetricReducer = None, control: TrainControl = None):
+    if reducer is None:
+        reducer = MetricReducer()
+    # Unwind on terminate, so that worker processes and shared memory are released
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit())
+    if workers > 1 and parallel_mode is ParallelMode.HOGWILD:
+        train_hogwild(queue, train_set, sampler, ai_model, workers, reducer, control)
+    elif workers > 1:
+        with DataParallelTrainer(ai_model, workers, sampler.batch_size) as model:
+            _train(queue, train_set, sampler, model, reducer, control, ai_model)
+    else:
+        _train(queue, train_set, sampler, ai_model, reducer, control, ai_model)
+    queue.put(None)
+
+
+# model trains the steps, the control applies to ai_model, which model trains
+def _train(queue, train_set, sampler, model, reducer: MetricReducer, control: TrainControl, ai_model):
+    loader = BatchLoader(train_set)
+    for indices in sampler:
+        if control is not None and not control.poll(ai_model, reducer, queue):
+            break
+        metric = model.train(*loader.load(indices))
+        queue.put(reducer.reduce(metric, indices))
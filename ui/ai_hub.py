@@ -1,14 +1,29 @@
+import numpy as np
+
 import ai
+from metric_log import MetricLog
 from ui.metrics_dispatcher import Hub
 
 
+# With a metric log, parameters are mapped from it instead of copied into memory
 class AiHub(Hub):
 
-    def __init__(self) -> None:
+    def __init__(self, log: MetricLog | None = None) -> None:
+        self._log = log
         self._ai_version = []
 
     def update_data(self, metrics: list[ai.TrainMetric]):
-        self._ai_version.extend([(m.w, m.b) for m in metrics])
+        # None for versions received without parameters
+        if self._log is not None:
+            self._log.refresh()
+            v = len(self._ai_version)
+            self._ai_version.extend([self._log.find_views('params', v + i) for i in range(len(metrics))])
+            return
+        self._ai_version.extend([m.layout.views(np.copy(m.params)) if m.params is not None else None
+                                 for m in metrics])
 
     def get_version(self, v):
         return self._ai_version[v]
+
+    def has_version(self, v):
+        return self._ai_version[v] is not None
@@ -2,7 +2,9 @@ from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QMdiArea, QSplitter, QMdiSubWindow
 
 import ai
+from metric_log import MetricLog, MetricLogWriter
 from ui.ai_hub import AiHub
+from ui.metric_log_hub import MetricLogHub
 from ui.metrics_dispatcher import MetricsDispatchWorkerThread
 from ui.plot.correlation import CorrelationWidget, CorrelationHub
 from ui.plot.cost import CostWidget, CostHub
@@ -21,10 +23,18 @@ class CentralWidget(QWidget):
     sigMetricsUpdated = pyqtSignal()
     sigRegionUpdated = pyqtSignal(int, int)
 
-    def __init__(self, queue, layer_count):
+    # train_set resolves the sample indices of metrics. Received metrics are written by log_writer, if any.
+    # Hubs map parameters from metric_log, or from the log_writer's log, instead of keeping copies
+    def __init__(self, queue, train_set, layer_count, metric_log: MetricLog | None = None,
+                 log_writer: MetricLogWriter | None = None):
         super().__init__()
         self._queue = queue
+        self._train_set = train_set
         self._layer_count = layer_count
+        self._log_writer = log_writer
+        self._metric_log = metric_log
+        if log_writer is not None and metric_log is None:
+            self._metric_log = MetricLog(log_writer.path)
         self._left = None
         self._right = None
 
@@ -38,22 +48,23 @@ class CentralWidget(QWidget):
 
     def _init_hubs(self):
         # Util
+        self._log_hubs = (MetricLogHub(self._log_writer),) if self._log_writer is not None else ()
         self._version_hub = VersionHub()
-        self._ai_hub = AiHub()
+        self._ai_hub = AiHub(self._metric_log)
 
         # Sub widgets
         self._cost_hub = CostHub()
-        self._recent_cost_hub = RecentCostHub()
-        self._correlation_hub = CorrelationHub()
-        self._distribution_hub = DistributionHub()
-        self._grad_len_hub = GradLenHub()
-        self._gradient_hub = GradientHub()
+        self._recent_cost_hub = RecentCostHub(self._metric_log)
+        self._correlation_hub = CorrelationHub(self._train_set[1], self._metric_log)
+        self._distribution_hub = DistributionHub(self._metric_log)
+        self._grad_len_hub = GradLenHub(self._metric_log)
+        self._gradient_hub = GradientHub(self._layer_count, self._metric_log)
 
     def _init_threads(self):
         # Metrics dispatch
         self._metrics_dispatcher = MetricsDispatchWorkerThread(self._queue, hubs=(
-            self._version_hub, self._ai_hub, self._cost_hub, self._recent_cost_hub, self._correlation_hub,
-            self._distribution_hub, self._grad_len_hub, self._gradient_hub
+            *self._log_hubs, self._version_hub, self._ai_hub, self._cost_hub, self._recent_cost_hub,
+            self._correlation_hub, self._distribution_hub, self._grad_len_hub, self._gradient_hub
         ))
         self._metrics_dispatcher.started.connect(self.sigTrainRun.emit)
         self._metrics_dispatcher.updated.connect(self.sigMetricsUpdated.emit)
@@ -127,16 +138,23 @@ class CentralWidget(QWidget):
 
     def _update_region(self, left_du, right_du):
         left = self._version_hub.get_version(left_du, approx=Approx.GE)
-        right = self._version_hub.get_version(right_du, approx=Approx.LE) + 1
+        right = self._version_hub.get_version(right_du, approx=Approx.LE)
 
         if left is None or right is None:
             left, right = None, None
+        else:
+            right += 1
 
         if self._left != left or self._right != right:
             self._left, self._right = left, right
             self.sigRegionUpdated.emit(self._left, self._right)
 
-    def get_ai_v_by_duv(self, data_used_version: int, act_funcs: tuple[ai.ActivationFunction]) -> ai.Ai:
+    def has_ai_v_by_duv(self, data_used_version: int) -> bool:
+        v = self._version_hub.get_version(data_used_version)
+        return self._ai_hub.has_version(v)
+
+    def get_ai_v_by_duv(self, data_used_version: int, act_funcs: tuple[ai.ActivationFunction],
+                        cost_function: ai.CostFunction) -> ai.Ai:
         v = self._version_hub.get_version(data_used_version)
         w, b = self._ai_hub.get_version(v)
-        return ai.Ai(weights=w, biases=b, activation_functions=act_funcs)
+        return ai.Ai(weights=w, biases=b, activation_functions=act_funcs, cost_function=cost_function)
@@ -1,10 +1,12 @@
 from PyQt5 import QtGui
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon, QKeySequence
-from PyQt5.QtWidgets import QMainWindow, QToolBar, QAction, QLabel
+from PyQt5.QtWidgets import QMainWindow, QToolBar, QAction, QLabel, QStyle, QInputDialog, QMessageBox
 
 import ai
 import resources.qrc as qrc_resources
+from control import TrainControl, TrainState
+from resources.app_ini import MetricDetail, str_to_learning_rates
 from ui.central_widget import CentralWidget
 from ui.test.test_window import TestWindow
 
@@ -14,12 +16,20 @@ qrc_resources = qrc_resources
 
 class MainWindow(QMainWindow):
 
-    def __init__(self, metrics_queue, test_data, ai_model: ai.Ai):
+    # The control, if any, steers the running training
+    def __init__(self, metrics_queue, train_set, test_data, ai_model: ai.Ai, metric_log=None, log_writer=None,
+                 control: TrainControl = None):
         super().__init__()
         self._queue = metrics_queue
+        self._metric_log = metric_log
+        self._log_writer = log_writer
+        self._control = control
+        self._learning_rate_map = getattr(ai_model.learning_rate, 'learning_rate_map', None)
+        self._train_set = train_set
         self._test_data = test_data
         self._layer_count = len(ai_model.w)
         self._activation_functions = ai_model.f
+        self._cost_function = ai_model.cost_function
 
         self._test_windows = []
         self._selected_ai_duv = None
@@ -34,13 +44,56 @@ class MainWindow(QMainWindow):
 
     def _init_widgets(self):
         # Plots
-        self._central_widget = CentralWidget(self._queue, self._layer_count)
+        self._central_widget = CentralWidget(self._queue, self._train_set, self._layer_count, self._metric_log,
+                                             self._log_writer)
         self.setCentralWidget(self._central_widget)
         self._central_widget.sigAiVersionSelected.connect(self.on_ai_version_selected)
         self._central_widget.sigTrainRun.connect(self.set_train_running_status)
         self._central_widget.sigTrainFinished.connect(self.set_train_finished_status)
 
     def _init_actions(self):
+        # Pause or resume train
+        pause_icon = self.style().standardIcon(QStyle.SP_MediaPause)
+        pause_text = '&Pause train'
+        pause_tip = 'Pause or resume train'
+        self._pause_action = QAction(pause_icon, pause_text, self)
+        self._pause_action.setCheckable(True)
+        self._pause_action.setStatusTip(pause_tip)
+        self._pause_action.setToolTip(pause_tip)
+        self._pause_action.toggled.connect(self.on_train_pause_toggled)
+
+        # Stop train
+        stop_icon = self.style().standardIcon(QStyle.SP_MediaStop)
+        stop_text = '&Stop train'
+        stop_tip = 'Stop train'
+        self._stop_action = QAction(stop_icon, stop_text, self)
+        self._stop_action.setStatusTip(stop_tip)
+        self._stop_action.setToolTip(stop_tip)
+        self._stop_action.triggered.connect(self.on_train_stop)
+
+        # Change learning rate
+        learning_rate_icon = self.style().standardIcon(QStyle.SP_ArrowDown)
+        learning_rate_text = '&Learning rate'
+        learning_rate_tip = 'Change learning rate of the running train'
+        self._learning_rate_action = QAction(learning_rate_icon, learning_rate_text, self)
+        self._learning_rate_action.setStatusTip(learning_rate_tip)
+        self._learning_rate_action.setToolTip(learning_rate_tip)
+        self._learning_rate_action.triggered.connect(self.on_learning_rate_change)
+
+        # Change metric detail
+        metric_detail_icon = self.style().standardIcon(QStyle.SP_FileDialogDetailedView)
+        metric_detail_text = '&Metric detail'
+        metric_detail_tip = 'Change detail of the metrics sent by the running train'
+        self._metric_detail_action = QAction(metric_detail_icon, metric_detail_text, self)
+        self._metric_detail_action.setStatusTip(metric_detail_tip)
+        self._metric_detail_action.setToolTip(metric_detail_tip)
+        self._metric_detail_action.triggered.connect(self.on_metric_detail_change)
+
+        self._control_actions = (self._pause_action, self._stop_action, self._learning_rate_action,
+                                 self._metric_detail_action)
+        for action in self._control_actions:
+            action.setDisabled(self._control is None)
+
         # Launch test window
         test_icon = QIcon(":test-icon")
         test_text = '&Run test'
@@ -123,6 +176,11 @@ class MainWindow(QMainWindow):
         self._main_toolbar.setToolButtonStyle(Qt.ToolButtonIconOnly)
         self.addToolBar(Qt.LeftToolBarArea, self._main_toolbar)
 
+        if self._control is not None:
+            for action in self._control_actions:
+                self._main_toolbar.addAction(action)
+            self._main_toolbar.addSeparator()
+
         self._main_toolbar.addAction(self._test_action)
 
         self._main_toolbar.addSeparator()
@@ -141,10 +199,56 @@ class MainWindow(QMainWindow):
         self._status_widget = QLabel('Initializing')
         self._statusbar.addPermanentWidget(self._status_widget)
 
+        # The train reports the state it reached through the control
+        self._control_timer = QTimer(self)
+        self._control_timer.setInterval(500)
+        self._control_timer.timeout.connect(self._update_control_status)
+
+    def _update_control_status(self):
+        state = self._control.state
+        if state is TrainState.PAUSED:
+            self._status_widget.setText('Paused train')
+        elif state is TrainState.STOPPED:
+            self._status_widget.setText('Stopping train')
+        else:
+            self._status_widget.setText('Running train')
+
+    def on_train_pause_toggled(self, paused: bool):
+        if paused:
+            self._control.pause()
+        else:
+            self._control.resume()
+
+    def on_train_stop(self):
+        self._control.stop()
+        for action in self._control_actions:
+            action.setDisabled(True)
+
+    def on_learning_rate_change(self):
+        text = ', '.join(f'{cost}: {rate}' for cost, rate in self._learning_rate_map.items()) \
+            if self._learning_rate_map else ''
+        text, ok = QInputDialog.getText(self, 'Learning rate', 'Cost thresholds to rates, as cost: rate, ...',
+                                        text=text)
+        if not ok:
+            return
+        try:
+            learning_rate_map = str_to_learning_rates(text)
+            self._control.set_learning_rate(learning_rate_map)
+        except (ValueError, IndexError) as e:
+            QMessageBox.warning(self, 'Learning rate', f'Invalid learning rate: {text}\n{e}')
+            return
+        self._learning_rate_map = learning_rate_map
+
+    def on_metric_detail_change(self):
+        details = [d.value for d in MetricDetail]
+        detail, ok = QInputDialog.getItem(self, 'Metric detail', 'Sent by every train step', details, editable=False)
+        if ok:
+            self._control.set_metric_detail(MetricDetail(detail))
+
     def on_ai_test_run(self):
         ai_version = self._selected_ai_duv
         act_funcs = self._activation_functions
-        ai_instance = self._central_widget.get_ai_v_by_duv(ai_version, act_funcs)
+        ai_instance = self._central_widget.get_ai_v_by_duv(ai_version, act_funcs, self._cost_function)
 
         test_window = TestWindow(ai_version, ai_instance, f'AI v.{ai_version} test', self._test_data)
         test_window.sigClosed.connect(self.on_test_window_close)
@@ -163,13 +267,19 @@ class MainWindow(QMainWindow):
 
     def _update_test_action_state(self):
         running_version_tests = [w.ai_version for w in self._test_windows]
-        enable_test_action = self._selected_ai_duv and self._selected_ai_duv not in running_version_tests
+        enable_test_action = self._selected_ai_duv and self._selected_ai_duv not in running_version_tests \
+            and self._central_widget.has_ai_v_by_duv(self._selected_ai_duv)
         self._test_action.setDisabled(not enable_test_action)
 
     def set_train_running_status(self):
         self._status_widget.setText('Running train')
+        if self._control is not None:
+            self._control_timer.start()
 
     def set_train_finished_status(self):
+        self._control_timer.stop()
+        for action in self._control_actions:
+            action.setDisabled(True)
         self._status_widget.setText('Finished train')
 
     def closeEvent(self, a0: QtGui.QCloseEvent) -> None:
@@ -0,0 +1,15 @@
+import ai
+from metric_log import MetricLogWriter
+from ui.metrics_dispatcher import Hub
+
+
+# Writes received metrics to the run log. Dispatched before the hubs that read the log back
+class MetricLogHub(Hub):
+
+    def __init__(self, writer: MetricLogWriter) -> None:
+        self._writer = writer
+
+    def update_data(self, metrics: list[ai.TrainMetric]):
+        for m in metrics:
+            self._writer.put(m)
+        self._writer.flush()
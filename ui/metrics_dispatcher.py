@@ -5,6 +5,8 @@ from PyQt5.QtCore import QThread, pyqtSignal
 import ai
 
 
+# Metric arrays may be views into the transport that are overwritten after update_data returns,
+# so hubs copy whatever they keep
 class Hub:
     def update_data(self, metrics: list[ai.TrainMetric]):
         pass
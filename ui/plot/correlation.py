@@ -4,26 +4,54 @@ from PyQt5.QtWidgets import QVBoxLayout, QWidget
 from pyqtgraph import PlotWidget
 
 import ai
+from metric_log import MetricLog
 from ui.metrics_dispatcher import Hub
 
 
+# With a metric log, outputs, expected outputs and sample indices are read from it instead of kept in memory
 class CorrelationHub(Hub):
-    def __init__(self) -> None:
+    # train_y resolves the sample indices of metrics sent without expected outputs
+    def __init__(self, train_y: np.ndarray, log: MetricLog | None = None) -> None:
         super().__init__()
+        self._train_y = train_y
+        self._log = log
+        self._size = 0
         self._act_outputs = []
         self._exp_outputs = []
+        self._indices = []
 
     def update_data(self, metrics: list[ai.TrainMetric]):
-        outputs = [np.concatenate(m.outputs, axis=None) for m in metrics]
-        expected = [np.concatenate(m.expected, axis=None) for m in metrics]
-        self._act_outputs.extend(outputs)
-        self._exp_outputs.extend(expected)
+        if self._log is not None:
+            self._log.refresh()
+            self._size += len(metrics)
+            return
+        for m in metrics:
+            has_expected = m.outputs is not None and m.expected is not None
+            has_indices = m.outputs is not None and m.indices is not None and not has_expected
+            self._act_outputs.append(np.concatenate(m.outputs, axis=None) if m.outputs is not None else np.empty(0))
+            self._exp_outputs.append(np.concatenate(m.expected, axis=None) if has_expected else np.empty(0))
+            self._indices.append(np.array(m.indices) if has_indices else None)
 
     def calc(self, left, right):
+        if self._log is not None:
+            return self._calc_from_log(left, min(right, self._size))
         act_outputs = np.concatenate(self._act_outputs[left:right])
-        exp_outputs = np.concatenate(self._exp_outputs[left:right]).flatten()
+        exp_outputs = np.concatenate([self._train_y[i].ravel() if i is not None else e
+                                      for e, i in zip(self._exp_outputs[left:right], self._indices[left:right])])
         return act_outputs, exp_outputs
 
+    # Expected outputs of the metrics with outputs, sent or resolved from the sample indices, in metric order
+    def _calc_from_log(self, left, right):
+        act_outputs, act_steps = self._log.sample_rows('outputs', left, right)
+        expected, exp_steps = self._log.sample_rows('expected', left, right)
+        indices, index_steps = self._log.sample_rows('indices', left, right)
+        has_expected = np.isin(exp_steps, act_steps)
+        has_indices = np.isin(index_steps, act_steps) & ~np.isin(index_steps, exp_steps)
+        resolved = np.asarray(self._train_y[indices[has_indices]]).reshape(-1, *expected.shape[1:])
+        order = np.argsort(np.concatenate((exp_steps[has_expected], index_steps[has_indices])), kind='stable')
+        exp_outputs = np.concatenate((expected[has_expected], resolved))[order]
+        return act_outputs.ravel(), exp_outputs.ravel()
+
 
 class CorrelationWidget(QWidget):
     def __init__(self, hub: CorrelationHub) -> None:
@@ -6,18 +6,38 @@ from pyqtgraph import PlotWidget
 
 import ai
 from ui.metrics_dispatcher import Hub
+from utils.array_utils import GrowableArray, MinMaxPyramid
 
 
+# Costs by data used, with a min/max pyramid of the costs, so a range is drawn with a point per pixel or so
 class CostHub(Hub):
     def __init__(self) -> None:
         super().__init__()
-        self._costs = []
+        self._data_used = GrowableArray((), np.int64)
+        self._costs = MinMaxPyramid(np.float64)
 
     def update_data(self, metrics: list[ai.TrainMetric]):
-        self._costs.extend([(m.data_used, m.cost) for m in metrics])
-
-    def calc(self):
-        return np.array(self._costs)
+        self._data_used.extend([m.data_used for m in metrics])
+        for m in metrics:
+            self._costs.append(m.cost)
+
+    @property
+    def data_used(self) -> np.ndarray:
+        return self._data_used.array
+
+    # (data used, cost) points of the metrics from left_du to right_du and one more on each side. With max_points,
+    # reduced to the ends and the min and max cost of neighbouring metrics, which are still points of metrics
+    def calc(self, left_du=None, right_du=None, max_points: int | None = None) -> np.ndarray:
+        # Written by the dispatcher thread meanwhile, costs last
+        size = len(self._costs)
+        data_used = self._data_used.array[:size]
+        left = 0 if left_du is None else max(int(np.searchsorted(data_used, left_du, side='left')) - 1, 0)
+        right = size if right_du is None else min(int(np.searchsorted(data_used, right_du, side='right')) + 1, size)
+        if max_points is None:
+            indices = np.arange(left, right)
+        else:
+            indices = self._costs.decimate(left, max(left, right), max_points)
+        return np.stack((data_used[indices], self._costs.values[indices]), axis=1)
 
 
 class CostWidget(QWidget):
@@ -34,7 +54,7 @@ class CostWidget(QWidget):
         layout = QVBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
 
-        plot = PlotWidget()
+        self._plot = plot = PlotWidget()
         plot.setTitle("Cost by train data")
         plot.setLabel('left', "Cost")
         plot.setLabel('bottom', "Train data")
@@ -58,6 +78,9 @@ class CostWidget(QWidget):
         plot.addItem(self.hover_scatter)
         plot.addItem(self.selection_scatter)
 
+        # Redrawn at the level of detail of the visible range
+        plot.getViewBox().sigXRangeChanged.connect(self._update_curve)
+
         self.curve.sigPointsHovered.connect(self.handle_points_hover)
         self.curve.sigPointsClicked.connect(self.handle_points_click)
         self.hover_scatter.sigClicked.connect(self.handle_points_click)
@@ -66,18 +89,29 @@ class CostWidget(QWidget):
         self.setLayout(layout)
 
     def refresh(self):
-        nodes = self._hub.calc()
-        self.curve.setData(nodes)
-        if nodes.size > 0:
-            self._lr.setBounds((nodes[0, 0], nodes[-1, 0]))
+        self._update_curve()
+        data_used = self._hub.data_used
+        if data_used.size > 0:
+            self._lr.setBounds((data_used[0], data_used[-1]))
             if not self._lr.isVisible():
                 self._lr.show()
-                region_left = nodes[0, 0]
-                region_right = nodes[min(5, nodes.shape[0] - 1), 0]
+                region_left = data_used[0]
+                region_right = data_used[min(5, data_used.shape[0] - 1)]
                 self._lr.setRegion((region_left, region_right))
         else:
             self._lr.hide()
 
+    # Points of the visible range, or of all metrics while auto ranging, about two per horizontal pixel
+    def _update_curve(self):
+        view_box = self._plot.getViewBox()
+        max_points = max(2 * int(view_box.width()), 2)
+        if view_box.autoRangeEnabled()[0]:
+            nodes = self._hub.calc(max_points=max_points)
+        else:
+            (left, right), _ = view_box.viewRange()
+            nodes = self._hub.calc(left, right, max_points)
+        self.curve.setData(nodes)
+
     def handle_points_hover(self, _data_item, spots, _ev):
         if len(spots):
             self.hover_spot(spots[0].pos())
@@ -5,28 +5,45 @@ from PyQt5.QtWidgets import QVBoxLayout, QWidget
 from pyqtgraph import PlotWidget
 
 import ai
+from metric_log import MetricLog
 from ui.metrics_dispatcher import Hub
 
 
+# With a metric log, outputs are read from it instead of kept in memory
 class DistributionHub(Hub):
-    def __init__(self) -> None:
+    def __init__(self, log: MetricLog | None = None) -> None:
         super().__init__()
+        self._log = log
+        self._size = 0
         self._neurons = []
         self._outputs = []
 
     def update_data(self, metrics: list[ai.TrainMetric]):
+        if self._log is not None:
+            self._log.refresh()
+            self._size += len(metrics)
+            return
         for m in metrics:
+            if m.outputs is None:
+                self._neurons.append(np.empty(0, dtype=int))
+                self._outputs.append(np.empty(0))
+                continue
             neurons = np.concatenate([np.indices(o.shape)[0] for o in m.outputs])
             outputs = np.concatenate([o for o in m.outputs])
             self._neurons.append(neurons)
             self._outputs.append(outputs)
 
     def calc(self, left, right, resolution):
-        neurons = np.concatenate(self._neurons[left:right])
-        outputs = np.concatenate(self._outputs[left:right])
+        if self._log is not None:
+            outputs, _ = self._log.sample_rows('outputs', left, min(right, self._size))
+            neurons = np.tile(np.arange(outputs.shape[1]), len(outputs))
+            outputs = outputs.ravel()
+        else:
+            neurons = np.concatenate(self._neurons[left:right])
+            outputs = np.concatenate(self._outputs[left:right])
         bin_x = resolution
         bin_y = np.linspace(0, 1, resolution)
-        hist, _, _ = np.histogram2d(neurons, outputs, bins=(bin_x, bin_y), normed=False)
+        hist, _, _ = np.histogram2d(neurons, outputs, bins=(bin_x, bin_y), density=False)
         return hist
 
 
@@ -3,19 +3,32 @@ from PyQt5.QtWidgets import QVBoxLayout, QWidget
 from pyqtgraph import PlotWidget
 
 import ai
+from metric_log import MetricLog
 from ui.metrics_dispatcher import Hub
+from utils.array_utils import GrowableArray
 
 
+# (data used, gradient length) rows, read from the metric log's columns if there is one
 class GradLenHub(Hub):
-    def __init__(self) -> None:
+    def __init__(self, log: MetricLog | None = None) -> None:
         super().__init__()
-        self._grad_lens = []
+        self._log = log
+        self._size = 0
+        self._grad_lens = GrowableArray((2,), np.float64)
 
     def update_data(self, metrics: list[ai.TrainMetric]):
+        if self._log is not None:
+            self._log.refresh()
+            self._size += len(metrics)
+            return
         self._grad_lens.extend([(m.data_used, m.gradient_len) for m in metrics])
 
     def calc(self, left, right):
-        return np.array(self._grad_lens[left:right])
+        if self._log is None:
+            return self._grad_lens.array[left:right]
+        right = min(right, self._size)
+        return np.stack((self._log.column('data_used')[left:right], self._log.column('gradient_len')[left:right]),
+                        axis=1)
 
 
 class GradLenWidget(QWidget):
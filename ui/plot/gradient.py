@@ -8,9 +8,11 @@ from PyQt5.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QSizePolicy, QFra
 from pyqtgraph import PlotWidget
 
 import ai
+from metric_log import MetricLog
 from ui.metrics_dispatcher import Hub
 from ui.plot.gradient_info import GradientInfo
 from ui.plot.gradient_params import Component, Mode, Aggregation, GradientParams
+from utils.array_utils import GrowableArray, SumPyramid, get_range_sum
 
 
 def flatten(it: Iterable | np.ndarray) -> np.ndarray:
@@ -53,58 +55,148 @@ def combine_distributions_params(
         raise ValueError('All arrays must be the same size')
 
     sizes_c = np.sum(sizes)
+    if sizes_c == 0:
+        return sizes_c, np.nan, np.nan
     means_c = np.sum(sizes * means) / sizes_c
     sds_c = (np.sum((means ** 2 + sds ** 2) * sizes) / sizes_c - means_c ** 2) ** 0.5
     return sizes_c, means_c, sds_c
 
 
-def get_info_aggr(data_slice: np.ndarray, aggregation: Aggregation):
-    if aggregation is Aggregation.NONE:
-        return data_slice
-    elif aggregation is Aggregation.SUM:
-        return np.sum(data_slice, axis=0)
-    elif aggregation is Aggregation.MEAN:
-        return np.mean(data_slice, axis=0)
-    else:
-        raise ValueError(f'Invalid aggregation: {aggregation}')
-
-
+# Sums of size, size * mean and size * (mean^2 + sd^2) over the last axis, which add up across distributions
+def get_moment_sums(stats: np.ndarray) -> np.ndarray:
+    sizes, means, sds = stats[..., 0], stats[..., 1], stats[..., 2]
+    return np.stack((sizes, sizes * means, sizes * (means ** 2 + sds ** 2)), axis=-1)
+
+
+# Size, mean and sd of the distribution with the moment sums
+def get_distribution_params_from_sums(sums: np.ndarray) -> tuple[float, float, float]:
+    size, size_mean, size_square = sums
+    if size == 0:
+        return size, np.nan, np.nan
+    mean = size_mean / size
+    return size, mean, max(size_square / size - mean ** 2, 0) ** 0.5
+
+
+# Stats sent by the trainer, computed from full arrays, or of size 0 when the metric has neither
+def get_layer_stats(stats: np.ndarray | None, arrays: tuple[np.ndarray, ...] | None, layer_count: int):
+    if stats is not None:
+        return stats
+    if arrays is not None:
+        return get_distribution_params_for_batch(*arrays)
+    return np.zeros((layer_count, 3))
+
+
+# Flat parameters or gradients of the metrics that had them, as (time, size) rows, with the metric numbers
+# they belong to. Kept in a growable array, or mapped from the metric log column name. Range sums come from
+# a pyramid of block sums, kept in memory or mapped from the log's sum columns
+class _FlatHistory:
+    def __init__(self, name: str, log: MetricLog | None = None) -> None:
+        self._name = name
+        self._log = log
+        self._steps = GrowableArray((), np.int64)
+        self._rows: GrowableArray | None = None
+        self._sums: SumPyramid | None = None
+
+    def append(self, step: int, flat: np.ndarray):
+        if self._log is not None:
+            return
+        if self._rows is None:
+            self._rows = GrowableArray(flat.shape, flat.dtype)
+            self._sums = SumPyramid(flat.shape, flat.dtype)
+        self._rows.append(flat)
+        self._sums.append(flat)
+        self._steps.append(step)
+
+    def _get_steps(self) -> np.ndarray:
+        return self._log.steps(self._name) if self._log is not None else self._steps.array
+
+    # Steps in [left, right)
+    def get_steps(self, left: int, right: int) -> np.ndarray:
+        steps = self._get_steps()
+        return steps[slice(*np.searchsorted(steps, (left, right)))]
+
+    # Rows of the steps in [left, right): views of the kept rows, or a copy from the log
+    def get_rows(self, left: int, right: int) -> np.ndarray | None:
+        rows = slice(*np.searchsorted(self._get_steps(), (left, right)))
+        if self._log is not None:
+            return self._log.column(self._name)[rows]
+        return self._rows.array[rows] if self._rows is not None else None
+
+    # Sum over the columns of the rows of the steps in [left, right), and the count of the rows
+    def get_sum(self, left: int, right: int, columns: slice) -> tuple[np.ndarray | None, int]:
+        first, last = np.searchsorted(self._get_steps(), (left, right))
+        if first == last:
+            return None, 0
+        first, last = int(first), int(last)
+        if self._log is None:
+            return self._sums.sum(self._rows.array, first, last, columns), last - first
+        rows = self._log.column(self._name)
+        if self._log.sum_block_size is None:
+            return np.sum(rows[first:last][..., columns], axis=0), last - first
+        levels = self._log.sum_levels(self._name)
+        return get_range_sum(rows, levels, self._log.sum_block_size, first, last, columns), last - first
+
+
+# (y, x) shape of the parameters number index of a layout; biases are (1, x)
+def get_param_shape(layout: ai.ParamLayout, index: int) -> tuple[int, int]:
+    shape = layout.shapes[index]
+    return shape if len(shape) == 2 else (1, *shape)
+
+
+def get_param_columns(layout: ai.ParamLayout, index: int) -> slice:
+    return slice(layout.offsets[index], layout.offsets[index + 1])
+
+
+# (time, y, x) view of the parameters number index of the flat rows
+def get_param_rows(layout: ai.ParamLayout, rows: np.ndarray, index: int) -> np.ndarray:
+    return rows[:, get_param_columns(layout, index)].reshape(len(rows), *get_param_shape(layout, index))
+
+
+# Parameters and gradients of the layers are views of flat per metric rows, kept in growable arrays or,
+# with a metric log, mapped from it. Region slices of them don't copy the kept rows
 class GradientHub(Hub):
 
-    def __init__(self) -> None:
-        self._data_used = []  # size=time
-        self._ws = []  # size=(time, layer, (y, x));  y and x are different for different layers
-        self._wg = []  # size=(time, layer, (y, x));  y and x are different for different layers
-        self._bs = []  # size=(time, layer, (y, x));  y and x are different for different layers
-        self._bg = []  # size=(time, layer, (y, x));  y and x are different for different layers
-        self._ws_stats = []  # size=(time, layer, stat); stat=3
-        self._wg_stats = []  # size=(time, layer, stat); stat=3
-        self._bs_stats = []  # size=(time, layer, stat); stat=3
-        self._bg_stats = []  # size=(time, layer, stat); stat=3
+    def __init__(self, layer_count: int, log: MetricLog | None = None) -> None:
+        self._layer_count = layer_count
+        self._log = log
+        self._layout = log.layout if log is not None else None
+        self._data_used = GrowableArray((), np.int64)  # size=time
+        self._params = _FlatHistory('params', log)  # size=(time with params, param)
+        self._gradients = _FlatHistory('gradient', log)  # size=(time with gradient, param)
+        # Prefix sums of the moment sums of the stats, so any range combines from two rows.
+        # size=(time + 1, layer, moment); moment=3
+        self._moment_sums = {key: GrowableArray((layer_count, 3), np.float64) for key in (
+            (Component.WEIGHTS, Mode.STATE), (Component.WEIGHTS, Mode.GRADIENT),
+            (Component.BIASES, Mode.STATE), (Component.BIASES, Mode.GRADIENT),
+        )}
+        for sums in self._moment_sums.values():
+            sums.append(0)
 
     def update_data(self, metrics: list[ai.TrainMetric]):
+        n = self._layer_count
+        if self._log is not None:
+            self._log.refresh()
         for m in metrics:
-            self._data_used.append(m.data_used)
-            self._ws.append(m.w)
-            self._wg.append(m.w_gradient)
-
-            ws_stats = get_distribution_params_for_batch(*m.w)
-            self._ws_stats.append(ws_stats)
+            step = len(self._data_used)
+            w, b = m.layout.views(m.params) if m.params is not None else (None, None)
+            wg, bg = m.layout.views(m.gradient) if m.gradient is not None else (None, None)
+            if m.layout is not None and self._layout is None:
+                self._layout = m.layout
 
-            wg_stats = get_distribution_params_for_batch(*m.w_gradient)
-            self._wg_stats.append(wg_stats)
-
-            bs_stats = get_distribution_params_for_batch(*m.b)
-            self._bs_stats.append(bs_stats)
-
-            bg_stats = get_distribution_params_for_batch(*m.b_gradient)
-            self._bg_stats.append(bg_stats)
+            self._data_used.append(m.data_used)
+            if m.params is not None:
+                self._params.append(step, m.params)
+            if m.gradient is not None:
+                self._gradients.append(step, m.gradient)
 
-            bs_2d = add_dimension_for_batch(*m.b)
-            self._bs.append(bs_2d)
+            self._add_stats(Component.WEIGHTS, Mode.STATE, get_layer_stats(m.w_stats, w, n))
+            self._add_stats(Component.WEIGHTS, Mode.GRADIENT, get_layer_stats(m.w_gradient_stats, wg, n))
+            self._add_stats(Component.BIASES, Mode.STATE, get_layer_stats(m.b_stats, b, n))
+            self._add_stats(Component.BIASES, Mode.GRADIENT, get_layer_stats(m.b_gradient_stats, bg, n))
 
-            bg_2d = add_dimension_for_batch(*m.b_gradient)
-            self._bg.append(bg_2d)
+    def _add_stats(self, component: Component, mode: Mode, stats):
+        sums = self._moment_sums[component, mode]
+        sums.append(sums.array[-1] + get_moment_sums(np.asarray(stats, dtype=np.float64)))
 
     def get_info(self,
                  left: int,
@@ -113,46 +205,50 @@ class GradientHub(Hub):
                  component: Component,
                  mode: Mode,
                  aggregation: Aggregation
-                 ) -> tuple[np.ndarray, tuple[float, float, float], tuple[float, float, float]]:
-        data_source = {
-            (Component.WEIGHTS, Mode.GRADIENT): (self._wg, self._wg_stats),
-            (Component.WEIGHTS, Mode.STATE): (self._ws, self._ws_stats),
-            (Component.BIASES, Mode.GRADIENT): (self._bg, self._bg_stats),
-            (Component.BIASES, Mode.STATE): (self._bs, self._bs_stats),
-        }
-        # size=(time, layer, (y, x));  y and x are different for different layers
-        data, data_stats = data_source[component, mode]
-        data_slice, data_stats_slice = data[left:right], data_stats[left:right]
-
-        # size=(time, y, x)
-        data_layer_slice = np.array([d[layer] for d in data_slice])
+                 ) -> tuple[np.ndarray | None, tuple[float, float, float], tuple[float, float, float]]:
+        left, right = self._clamp(left, right)
+        history = self._params if mode is Mode.STATE else self._gradients
+        # size=(y, x) or (time, y, x) no aggregation; only times with parameters
+        aggregated_data = self._get_layer_data(history, left, right, layer, component, aggregation)
 
-        # size=(y, x) or (time, y, x) no aggregation
-        aggregated_data = get_info_aggr(data_layer_slice, aggregation)
-
-        # shape=(layer, stat, time); stat=3
-        grouped_stats = np.array(data_stats_slice).transpose(1, 2, 0)
-
-        # shape=(layer, stat); stat=3
-        combined_stats = [combine_distributions_params(s[0], s[1], s[2]) for s in grouped_stats]
-
-        # shape=stat; stat=3
-        layer_combined_stats = combined_stats[layer]
-
-        # shape=(stat, layer); stat=3
-        grouped_combined_stats = np.array(combined_stats).transpose(1, 0)
+        # shape=(layer, moment); moment=3
+        sums = self._moment_sums[component, mode].array
+        range_sums = sums[right] - sums[left]
 
         # shape=stat; stat=3
-        combined_combined_stats = combine_distributions_params(
-            grouped_combined_stats[0],
-            grouped_combined_stats[1],
-            grouped_combined_stats[2]
-        )
+        layer_combined_stats = get_distribution_params_from_sums(range_sums[layer])
+        combined_combined_stats = get_distribution_params_from_sums(range_sums.sum(axis=0))
 
         return aggregated_data, layer_combined_stats, combined_combined_stats
 
+    # The region is of the steps of all hubs, which may have received steps this one hasn't yet
+    def _clamp(self, left: int, right: int) -> tuple[int, int]:
+        right = min(max(right, 0), len(self._data_used))
+        return min(max(left, 0), right), right
+
+    def _get_layer_data(self, history: _FlatHistory, left: int, right: int, layer: int, component: Component,
+                        aggregation: Aggregation) -> np.ndarray | None:
+        if self._layout is None:
+            return None
+        index = layer if component is Component.WEIGHTS else len(self._layout.w_shapes) + layer
+        if aggregation is Aggregation.NONE:
+            rows = history.get_rows(left, right)
+            return get_param_rows(self._layout, rows, index) if rows is not None and len(rows) else None
+        total, count = history.get_sum(left, right, get_param_columns(self._layout, index))
+        if total is None:
+            return None
+        total = total.reshape(get_param_shape(self._layout, index))
+        if aggregation is Aggregation.SUM:
+            return total
+        elif aggregation is Aggregation.MEAN:
+            return total / count
+        else:
+            raise ValueError(f'Invalid aggregation: {aggregation}')
+
+    # Times of the data returned by get_info
     def get_x_vals(self, left, right):
-        return np.array(self._data_used[left:right])
+        left, right = self._clamp(left, right)
+        return self._data_used.array[self._params.get_steps(left, right)]
 
 
 class GradientWidget(QWidget):
@@ -223,8 +319,11 @@ class GradientWidget(QWidget):
             info, layer_stats, stats = self._hub.get_info(
                 self._left, self._right, self._layer, self._component, self._mode, self._aggregation
             )
-            x_vals = self._hub.get_x_vals(self._left, self._right)
-            self._imv.setImage(info, xvals=x_vals)
+            if info is not None:
+                x_vals = self._hub.get_x_vals(self._left, self._right)
+                self._imv.setImage(info, xvals=x_vals)
+            else:
+                self._imv.clear()
             self._gradient_info.set_layer_info(*layer_stats)
             self._gradient_info.set_info(*stats)
         else:
@@ -3,24 +3,38 @@ from PyQt5.QtWidgets import QVBoxLayout, QWidget
 from pyqtgraph import PlotWidget
 
 import ai
+from metric_log import MetricLog
 from ui.metrics_dispatcher import Hub
+from utils.array_utils import GrowableArray
 
 
+# (data used, cost) rows, read from the metric log's columns if there is one
 class RecentCostHub(Hub):
-    def __init__(self) -> None:
+    def __init__(self, log: MetricLog | None = None) -> None:
         super().__init__()
-        self._costs = []
+        self._log = log
+        self._size = 0
+        self._costs = GrowableArray((2,), np.float64)
 
     def update_data(self, metrics: list[ai.TrainMetric]):
+        if self._log is not None:
+            self._log.refresh()
+            self._size += len(metrics)
+            return
         self._costs.extend([(m.data_used, m.cost) for m in metrics])
 
+    def _get_costs(self, left, right) -> np.ndarray:
+        if self._log is None:
+            return self._costs.array[left:right]
+        return np.stack((self._log.column('data_used')[left:right], self._log.column('cost')[left:right]), axis=1)
+
     def calc(self, max_range):
-        left = max(0, len(self._costs) - max_range)
-        right = len(self._costs)
+        right = self._size if self._log is not None else len(self._costs)
+        left = max(0, right - max_range)
 
         costs, avg_costs = [], []
         if right > left:
-            costs = np.array(self._costs[left:right])
+            costs = self._get_costs(left, right)
 
             if right > left + 1:
                 avg_cost = np.mean(costs[:, 1])
@@ -1,5 +1,6 @@
 import dataclasses
 
+import numpy as np
 from PyQt5.QtCore import Qt, QSize, QTimer
 from PyQt5.QtGui import QIntValidator
 from PyQt5.QtWidgets import QWidget, QPushButton, QLineEdit, QVBoxLayout, QSizePolicy, QFormLayout, \
@@ -7,12 +8,16 @@ from PyQt5.QtWidgets import QWidget, QPushButton, QLineEdit, QVBoxLayout, QSizeP
 
 import ai
 import resources.qrc as qrc_resources
-from data_set import unscale, unvectorize
+from data_set import scale
 from ui.test.dataset.img_viewer import ImageViewer
+from utils.zip_utils import zip2
 
 # To save from imports optimization by IDEs
 qrc_resources = qrc_resources
 
+# Test samples predicted at once when the test reaches them
+PREDICT_BLOCK_SIZE = 500
+
 
 @dataclasses.dataclass
 class TestInfo:
@@ -37,6 +42,8 @@ class DatasetTestWidget(QWidget):
         self._data_iterator = None
         self._ai_model = ai_model
         self._test_data = test_data
+        # Guesses predicted so far, kept for resets
+        self._guesses = []
         self._default_interval = 0
 
         self._init_layout()
@@ -166,22 +173,29 @@ class DatasetTestWidget(QWidget):
     def set_interval(self):
         self._test_timer.setInterval(int(self._interval_edit.text()))
 
+    # Guesses of the test samples, predicted a block at a time as the test goes, so the widget shows at once
+    def _iterate_guesses(self):
+        for i in range(len(self._test_data)):
+            if i == len(self._guesses):
+                block = self._test_data[i:i + PREDICT_BLOCK_SIZE]
+                test_x = scale(np.array([x for x, _ in block]), self._ai_model.dtype)
+                self._guesses.extend(self._ai_model.predict(test_x)[1])
+            yield self._guesses[i]
+
     def reset_test_info(self):
-        self._data_iterator = iter(self._test_data)
+        self._data_iterator = zip2(self._test_data, self._iterate_guesses())
         self._test_info = TestInfo()
         self._display_info()
 
     def update_test_info(self):
         try:
-            x, ye = next(self._data_iterator)
+            (x, y), actual_digit = next(self._data_iterator)
         except StopIteration:
             self.finish_test()
             return
-        ya = self._ai_model.feed(x)
 
-        image = unscale(x)
-        actual_digit = unvectorize(ya)
-        expected_digit = unvectorize(ye)
+        image = np.array(x)
+        expected_digit = int(y)
         self._test_info.update(image, actual_digit, expected_digit)
         self._display_info()
 
@@ -1,7 +1,10 @@
 from enum import Enum
 
+import numpy as np
+
 import ai
 from ui.metrics_dispatcher import Hub
+from utils.array_utils import GrowableArray
 
 
 class Approx(Enum):
@@ -10,25 +13,41 @@ class Approx(Enum):
     GE = 3
 
 
+# Versions are the numbers of the received metrics, found by data used, which doesn't decrease from metric to
+# metric. Of equal data used values, the first version is found
 class VersionHub(Hub):
     def __init__(self) -> None:
         super().__init__()
-        self._data_used_versions = []
+        self._data_used_versions = GrowableArray((), np.int64)
 
     def get_version(self, duv, approx: Approx | None = None):
         if approx is None:
             approx = Approx.EQ
+        v = int(self.get_versions(np.array([duv]), approx)[0])
+        if v != -1:
+            return v
         if approx is Approx.EQ:
-            return self._data_used_versions.index(duv)
+            raise ValueError(f'{duv} is not a data used version')
+        return None
+
+    # Versions of many data used values at once, -1 where there is none
+    def get_versions(self, duvs: np.ndarray, approx: Approx = Approx.EQ) -> np.ndarray:
+        data_used = self._data_used_versions.array
+        duvs = np.asarray(duvs)
+        if approx not in (Approx.EQ, Approx.LE, Approx.GE):
+            raise ValueError(f'Invalid approx parameter value: {approx}')
+        if len(data_used) == 0:
+            return np.full(duvs.shape, -1)
+        if approx is Approx.EQ or approx is Approx.GE:
+            vs = np.searchsorted(data_used, duvs, side='left')
+            found = vs < len(data_used)
+            if approx is Approx.EQ:
+                found[found] = data_used[vs[found]] == duvs[found]
         elif approx is Approx.LE:
-            near_vs = [v for v in self._data_used_versions if v <= duv]
-            near_v = max(near_vs) if len(near_vs) else None
-            return self._data_used_versions.index(near_v) if near_v else None
-        elif approx is Approx.GE:
-            near_vs = [v for v in self._data_used_versions if v >= duv]
-            near_v = min(near_vs) if len(near_vs) else None
-            return self._data_used_versions.index(near_v) if near_v else None
-        raise ValueError(f'Invalid approx parameter value: {approx}')
+            last = np.searchsorted(data_used, duvs, side='right') - 1
+            found = last >= 0
+            vs = np.searchsorted(data_used, data_used[np.maximum(last, 0)], side='left')
+        return np.where(found, vs, -1)
 
     def update_data(self, metrics: list[ai.TrainMetric]):
         self._data_used_versions.extend([m.data_used for m in metrics])
@@ -0,0 +1,157 @@
+import numpy as np
+
+
+# Rows appended in place to a buffer that doubles when full, so appends are amortized O(1) and slices of the rows
+# are views. Views taken before a growth keep viewing the previous buffer
+class GrowableArray:
+    def __init__(self, shape: tuple[int, ...], dtype, capacity=16) -> None:
+        if capacity < 1:
+            raise ValueError(f'Capacity must be positive. Got: {capacity}')
+        self._buffer = np.empty((capacity, *shape), dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def array(self) -> np.ndarray:
+        return self._buffer[:self._size]
+
+    def append(self, row):
+        self._reserve(self._size + 1)
+        self._buffer[self._size] = row
+        self._size += 1
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=self._buffer.dtype)
+        self._reserve(self._size + len(rows))
+        self._buffer[self._size:self._size + len(rows)] = rows
+        self._size += len(rows)
+
+    def _reserve(self, size: int):
+        if size <= len(self._buffer):
+            return
+        buffer = np.empty((max(size, 2 * len(self._buffer)), *self._buffer.shape[1:]), dtype=self._buffer.dtype)
+        buffer[:self._size] = self.array
+        self._buffer = buffer
+
+
+# Sum of rows[left:right] over the columns of the last axis, from the levels of a SumPyramid of the rows with
+# block_size: O(log n) blocks plus up to 2 * (block_size - 1) rows at the unaligned ends. Rows and levels are
+# arrays, or anything sliceable by range and indexable by row alike
+def get_range_sum(rows, levels, block_size: int, left: int, right: int, columns=slice(None), dtype=None):
+    left_block, right_block = -(-left // block_size), right // block_size
+    if left_block >= right_block:
+        return np.sum(rows[left:right][..., columns], axis=0, dtype=dtype)
+    total = np.sum(rows[left:left_block * block_size][..., columns], axis=0, dtype=dtype)
+    total += np.sum(rows[right_block * block_size:right][..., columns], axis=0, dtype=dtype)
+    for level in levels:
+        if left_block >= right_block:
+            break
+        if left_block % 2:
+            total += level[left_block][..., columns]
+            left_block += 1
+        if right_block % 2:
+            right_block -= 1
+            total += level[right_block][..., columns]
+        left_block //= 2
+        right_block //= 2
+    return total
+
+
+# Sums of aligned blocks of rows appended one at a time: level k holds sums of block_size * 2^k rows. Keeps
+# about 2 / block_size as many rows as it sums. Levels are growable arrays, or what new_level(k) returns:
+# anything with append, as levels are only appended to
+class SumPyramid:
+    def __init__(self, shape: tuple[int, ...], dtype, block_size=16, new_level=None) -> None:
+        if block_size < 1:
+            raise ValueError(f'Block size must be positive. Got: {block_size}')
+        self._shape = shape
+        self._dtype = np.dtype(dtype)
+        self._block_size = block_size
+        self._new_level = new_level if new_level is not None else lambda _: GrowableArray(shape, dtype)
+        self._levels = []
+        # The last block of every level with an odd count of blocks, waiting for its pair
+        self._carries: list[np.ndarray | None] = []
+        self._pending = np.zeros(shape, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row):
+        self._pending += row
+        self._size += 1
+        if self._size % self._block_size:
+            return
+        block = self._pending.copy()
+        self._pending.fill(0)
+        k = 0
+        while True:
+            if k == len(self._levels):
+                self._levels.append(self._new_level(k))
+                self._carries.append(None)
+            self._levels[k].append(block)
+            if self._carries[k] is None:
+                self._carries[k] = block
+                break
+            block = self._carries[k] + block
+            self._carries[k] = None
+            k += 1
+
+    # Sum of rows[left:right] over the columns of the last axis; rows are the summed rows, sliceable by range.
+    # Only for growable array levels
+    def sum(self, rows, left: int, right: int, columns=slice(None)) -> np.ndarray:
+        if not 0 <= left <= right <= self._size:
+            raise IndexError(f'Range [{left}, {right}) is out of range of {self._size} rows')
+        levels = [level.array for level in self._levels]
+        return get_range_sum(rows, levels, self._block_size, left, right, columns, self._dtype)
+
+
+# Indices of the min and max of aligned blocks of values appended one at a time: level k holds those of blocks
+# of 2^(k+1) values. Reduces a range of values to the indices of their extremes per block, for plotting
+class MinMaxPyramid:
+    def __init__(self, dtype=np.float64) -> None:
+        self._values = GrowableArray((), dtype)
+        self._levels: list[GrowableArray] = []
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values.array
+
+    def append(self, value):
+        self._values.append(value)
+        size = len(self._values)
+        values = self._values.array
+        mins = maxs = np.array((size - 2, size - 1))
+        k = 0
+        while size % 2 ** (k + 1) == 0:
+            if k == len(self._levels):
+                self._levels.append(GrowableArray((2,), np.int64))
+            if k > 0:
+                mins, maxs = self._levels[k - 1].array[-2:].T
+            self._levels[k].append((mins[np.argmin(values[mins])], maxs[np.argmax(values[maxs])]))
+            k += 1
+
+    # Sorted indices of values[left:right], all of them if there are at most max_points, else about max_points:
+    # the ends of the range and the min and max of blocks small enough
+    def decimate(self, left: int, right: int, max_points: int) -> np.ndarray:
+        if not 0 <= left <= right <= len(self):
+            raise IndexError(f'Range [{left}, {right}) is out of range of {len(self)} values')
+        if right - left <= max_points or not self._levels:
+            return np.arange(left, right)
+        # 2 points per block, up to 6 for the ends
+        block_count = max(max_points // 2 - 3, 1)
+        k = int(np.ceil(np.log2(max((right - left) / block_count, 2)))) - 1
+        k = min(k, len(self._levels) - 1)
+        level, block = self._levels[k].array, 2 ** (k + 1)
+        first, last = -(-left // block), min(right // block, len(level))
+        values = self._values.array
+        parts = [np.array((left, right - 1)), level[first:last].ravel()]
+        for a, b in ((left, min(first * block, right)), (max(last * block, left), right)):
+            if a < b:
+                parts.append(np.array((a + np.argmin(values[a:b]), a + np.argmax(values[a:b]))))
+        return np.unique(np.concatenate(parts))
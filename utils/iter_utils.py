@@ -1,6 +1,9 @@
-import random
+import copy
+import itertools
 from typing import Generator, TypeVar
 
+import numpy as np
+
 T = TypeVar('T')
 
 
@@ -59,24 +62,46 @@ def is_iterable(val):
     return True
 
 
-def random_iterator(values: list[T]) -> Generator[T, None, None]:
-    values_copy = values.copy()
-    random.shuffle(values_copy)
-    yield from values_copy
-
-
-def random_extended_chunked_list(values: list[T], chunk_size: int, chunk_count: int) -> list[list[T]]:
-    result_list = []
-    it = iter([])
-    while len(result_list) < chunk_count:
-        chunk = []
-        while len(chunk) < chunk_size:
-            try:
-                v = next(it)
-            except StopIteration:
-                it = random_iterator(values)
-                v = next(it)
-            chunk.append(v)
-        result_list.append(chunk)
-
-    return result_list
+# Batches of sample indices of a set of size samples, drawn from a new permutation every epoch. A batch that
+# reaches the end of an epoch continues into the next one, so all batches are full. Yields count batches,
+# or endlessly with count None. Every iteration yields the same batches, and shard(rank, workers)
+# yields every workers-th of them from rank on. Without a seed, one is drawn from numpy's global state
+class EpochSampler:
+    def __init__(self, size: int, batch_size: int, count: int | None = None, seed: int | None = None) -> None:
+        if size < 1 or batch_size < 1:
+            raise ValueError(f'Size and batch size must be positive. Got: {size}, {batch_size}')
+        if count is not None and count < 0:
+            raise ValueError(f'Count must not be negative. Got: {count}')
+        self.size = size
+        self.batch_size = batch_size
+        self.count = count
+        self.seed = seed if seed is not None else int(np.random.randint(2 ** 63 - 1, dtype=np.int64))
+        self._rank = 0
+        self._workers = 1
+
+    def shard(self, rank: int, workers: int) -> 'EpochSampler':
+        if not 0 <= rank < workers:
+            raise ValueError(f'Rank must be in [0, {workers}). Got: {rank}')
+        sampler = copy.copy(self)
+        sampler._rank, sampler._workers = rank, workers
+        return sampler
+
+    def __len__(self):
+        if self.count is None:
+            raise TypeError('Endless sampler has no length')
+        return len(range(self._rank, self.count, self._workers))
+
+    def __iter__(self) -> Generator[np.ndarray, None, None]:
+        rng = np.random.default_rng(self.seed)
+        permutation, pos = np.empty(0, dtype=np.int32), 0
+        steps = itertools.count() if self.count is None else range(self.count)
+        for step in steps:
+            parts, left = [], self.batch_size
+            while left:
+                if pos == len(permutation):
+                    permutation, pos = rng.permutation(self.size).astype(np.int32), 0
+                parts.append(permutation[pos:pos + left])
+                pos += len(parts[-1])
+                left -= len(parts[-1])
+            if step % self._workers == self._rank:
+                yield parts[0] if len(parts) == 1 else np.concatenate(parts)
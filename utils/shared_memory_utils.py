@@ -0,0 +1,45 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+# Arrays laid out one after another in a single shared memory block
+class SharedArrays:
+    def __init__(self, shapes: list[tuple[int, ...]], dtype, name: str | None = None) -> None:
+        self.shapes = [tuple(s) for s in shapes]
+        self.dtype = np.dtype(dtype)
+        sizes = [int(np.prod(s)) for s in self.shapes]
+        size = sum(sizes)
+        if name is None:
+            self._shm = SharedMemory(create=True, size=max(1, size * self.dtype.itemsize))
+            self._owner = True
+        else:
+            self._shm = SharedMemory(name=name)
+            self._owner = False
+        self.flat = np.ndarray(size, dtype=self.dtype, buffer=self._shm.buf)
+        offsets = np.cumsum([0] + sizes)
+        self.arrays = [self.flat[o:o + s].reshape(shape) for o, s, shape in zip(offsets, sizes, self.shapes)]
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    # Picklable description to attach the same block in another process
+    def spec(self) -> tuple[list[tuple[int, ...]], np.dtype, str]:
+        return self.shapes, self.dtype, self.name
+
+    @staticmethod
+    def attach(spec: tuple[list[tuple[int, ...]], np.dtype, str]) -> 'SharedArrays':
+        shapes, dtype, name = spec
+        return SharedArrays(shapes, dtype, name)
+
+    def close(self):
+        self.flat = self.arrays = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # Views are still referenced somewhere; the mapping is released with them
+            pass
+        if self._owner:
+            self._shm.unlink()
+